@@ -0,0 +1,183 @@
+"""
+In-process buffer for UserActivity writes.
+
+Requests hand unsaved activities to the buffer and return immediately; a
+background thread flushes them with bulk_create once enough have queued up or
+the flush interval has passed. The queue is bounded: once it passes its
+high-water mark new records are sampled, and once it is full they are dropped.
+"""
+import atexit
+import logging
+import os
+import queue
+import random
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .signals import activities_recorded
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'ENABLED': True,
+    'MAX_QUEUE_SIZE': 10000,
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 2.0,  # seconds
+    'HIGH_WATER_MARK': 0.8,  # fraction of MAX_QUEUE_SIZE
+    'OVERLOAD_SAMPLE_RATE': 0.1,  # fraction of records kept above the high-water mark
+}
+
+
+class ActivityBuffer:
+    """
+    Bounded queue of unsaved UserActivity instances with a background flusher
+    """
+
+    def __init__(self, enabled=True, max_queue_size=10000, batch_size=500,
+                 flush_interval=2.0, high_water_mark=0.8, overload_sample_rate=0.1):
+        self.enabled = enabled
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.high_water = int(max_queue_size * high_water_mark)
+        self.overload_sample_rate = overload_sample_rate
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.dropped = 0
+        self.sampled_out = 0
+
+        self._start_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._atexit_registered = False
+
+    @classmethod
+    def from_settings(cls):
+        options = {**DEFAULT_SETTINGS, **getattr(settings, 'ACTIVITY_BUFFER', {})}
+        return cls(
+            enabled=options['ENABLED'],
+            max_queue_size=options['MAX_QUEUE_SIZE'],
+            batch_size=options['BATCH_SIZE'],
+            flush_interval=options['FLUSH_INTERVAL'],
+            high_water_mark=options['HIGH_WATER_MARK'],
+            overload_sample_rate=options['OVERLOAD_SAMPLE_RATE'],
+        )
+
+    def add(self, activity):
+        """
+        Queue an unsaved activity. Returns False if it was sampled out or dropped.
+        """
+        if not self.enabled:
+            self._write([activity], buffered=False)
+            return True
+
+        self._ensure_started()
+
+        if self.queue.qsize() >= self.high_water and random.random() >= self.overload_sample_rate:
+            with self._stats_lock:
+                self.sampled_out += 1
+            return False
+
+        try:
+            self.queue.put_nowait(activity)
+        except queue.Full:
+            with self._stats_lock:
+                self.dropped += 1
+            logger.warning("Activity buffer full, dropping activity for user %s", activity.user_id)
+            return False
+
+        if self.queue.qsize() >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def flush(self):
+        """
+        Write everything currently queued. Returns the number of rows written.
+        """
+        written = 0
+        with self._flush_lock:
+            while True:
+                batch = self._drain()
+                if not batch:
+                    break
+                written += self._write(batch)
+        return written
+
+    def shutdown(self, timeout=5.0):
+        """Stop the flusher thread and write out whatever is left"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
+        self.flush()
+
+    def _ensure_started(self):
+        # The pid check restarts the flusher in worker processes forked after
+        # the parent had already started one.
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='activity-buffer', daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.shutdown)
+                self._atexit_registered = True
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                if self.flush():
+                    close_old_connections()
+            except Exception:
+                logger.exception("Activity buffer flush failed")
+
+    def _drain(self):
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch, buffered=True):
+        from .models import UserActivity
+
+        try:
+            with transaction.atomic():
+                created = UserActivity.objects.bulk_create(batch)
+        except Exception:
+            logger.exception("Failed to write %d buffered activities, retrying one by one", len(batch))
+            created = self._write_each(batch)
+            if not created:
+                return 0
+
+        activities_recorded.send(sender=UserActivity, activities=created, buffered=buffered)
+        return len(created)
+
+    def _write_each(self, batch):
+        """Insert rows one at a time so one bad row only loses itself"""
+        created = []
+        for activity in batch:
+            try:
+                with transaction.atomic():
+                    activity.save(force_insert=True)
+            except Exception:
+                logger.exception("Dropping unwritable activity for user %s", activity.user_id)
+            else:
+                created.append(activity)
+        return created
+
+
+# Global instance
+activity_buffer = ActivityBuffer.from_settings()
@@ -0,0 +1,48 @@
+"""
+Per-user cached snapshot of the most recent activities.
+
+The snapshot is built on first use and dropped once a change to the user's
+activity commits, so template renders normally cost a cache read and no query.
+Other processes may show a dropped snapshot for up to CACHE_TIMEOUT.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from django.dispatch import receiver
+
+from .models import UserActivity
+from .signals import activities_read, activities_recorded
+
+RECENT_ACTIVITY_LIMIT = 5
+CACHE_TIMEOUT = 30  # seconds
+
+
+def _cache_key(user_id):
+    return f'activity_recent:{user_id}'
+
+
+def get_recent_activities(user_id):
+    """The user's latest activities, newest first"""
+    activities = cache.get(_cache_key(user_id))
+    if activities is None:
+        activities = list(
+            UserActivity.objects.filter(user_id=user_id)
+            .defer('user_agent', 'referrer')
+            .order_by('-timestamp', '-id')[:RECENT_ACTIVITY_LIMIT]
+        )
+        cache.set(_cache_key(user_id), activities, CACHE_TIMEOUT)
+    return activities
+
+
+def invalidate_recent_activities(user_id):
+    transaction.on_commit(lambda: cache.delete(_cache_key(user_id)))
+
+
+@receiver(activities_recorded)
+def drop_snapshot_on_record(sender, activities, **kwargs):
+    for user_id in {a.user_id for a in activities}:
+        invalidate_recent_activities(user_id)
+
+
+@receiver(activities_read)
+def drop_snapshot_on_read(sender, user_id, **kwargs):
+    invalidate_recent_activities(user_id)
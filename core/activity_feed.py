@@ -0,0 +1,62 @@
+"""
+Model-free serialization for activity feed responses.
+
+Feed queries fetch only FEED_FIELDS as tuples, so no model instances are built
+and the user_agent/referrer TEXT columns are never read. Icons and priority
+classes come from module-level lookup tables, and a whole page is encoded with
+a single json.dumps call.
+"""
+import json
+
+PRIORITY_CLASSES = {
+    'low': 'bg-blue-100 text-blue-800',
+    'medium': 'bg-yellow-100 text-yellow-800',
+    'high': 'bg-red-100 text-red-800',
+}
+DEFAULT_PRIORITY_CLASS = 'bg-gray-100 text-gray-800'
+
+ACTIVITY_ICONS = {
+    'course_view': 'eye',
+    'course_progress': 'trending-up',
+    'resource_download': 'download',
+    'forum_post': 'message-square',
+    'forum_reply': 'message-circle',
+    'achievement': 'award',
+    'search': 'search',
+    'enroll': 'user-plus',
+    'complete': 'check-circle',
+    'certificate': 'file-text',
+}
+DEFAULT_ICON = 'activity'
+
+FEED_FIELDS = (
+    'id', 'activity_type', 'page_title', 'timestamp', 'is_read',
+    'is_important', 'progress', 'metadata', 'priority',
+)
+
+
+def feed_item(row):
+    """Feed entry for a tuple of FEED_FIELDS values"""
+    activity_id, activity_type, title, timestamp, is_read, is_important, progress, metadata, priority = row
+    return {
+        'id': activity_id,
+        'type': activity_type,
+        'title': title,
+        'timestamp': timestamp.isoformat(),
+        'is_read': is_read,
+        'is_important': is_important,
+        'progress': progress,
+        'metadata': metadata,
+        'priority': priority,
+        'priority_class': PRIORITY_CLASSES.get(priority, DEFAULT_PRIORITY_CLASS),
+        'icon': ACTIVITY_ICONS.get(activity_type, DEFAULT_ICON),
+    }
+
+
+def feed_rows(queryset):
+    return queryset.values_list(*FEED_FIELDS)
+
+
+def encode_feed(rows, **extra):
+    """JSON document with the feed entries for ``rows`` plus any ``extra`` keys"""
+    return json.dumps({'activities': [feed_item(row) for row in rows], **extra})
@@ -0,0 +1,143 @@
+"""
+Server-Sent Events stream of new activities.
+
+ActivityBroker is an in-process pub/sub: the activity write path publishes
+each recorded activity and every open stream for that user receives it on its
+own event loop. Streams need an ASGI server (see techforge/asgi.py) and only
+see activities written by the same process. Under WSGI each open stream
+would hold a worker thread, so they are off unless ACTIVITY_STREAM_ENABLED
+is set, and the feed polls instead. Streams also end after
+ACTIVITY_STREAM_MAX_LIFETIME seconds; the browser reconnects and resumes.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.dispatch import receiver
+
+from .models import UserActivity
+from .signals import activities_recorded
+
+HEARTBEAT_INTERVAL = 15  # seconds
+RECONNECT_DELAY = 5000  # milliseconds, sent to the browser as ``retry``
+SUBSCRIBER_QUEUE_SIZE = 100
+MAX_REPLAY = 100
+
+
+def stream_enabled():
+    return getattr(settings, 'ACTIVITY_STREAM_ENABLED', False)
+
+# Queued in place of a slow subscriber's backlog; its stream then closes so
+# the browser reconnects and catches up from the database.
+RESYNC = object()
+
+
+class ActivityBroker:
+    """
+    Fans published activities out to per-user subscriber queues
+    """
+
+    def __init__(self, queue_size=SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """Register a queue on the running event loop"""
+        subscription = (asyncio.get_running_loop(), asyncio.Queue(maxsize=self.queue_size))
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, user_id, subscription):
+        with self._lock:
+            self._subscribers[user_id].discard(subscription)
+            if not self._subscribers[user_id]:
+                del self._subscribers[user_id]
+
+    def publish(self, user_id, event):
+        """Deliver an event to the user's streams; safe to call from any thread"""
+        with self._lock:
+            subscriptions = list(self._subscribers.get(user_id, ()))
+        for loop, queue in subscriptions:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, event)
+            except RuntimeError:
+                # Event loop already closed
+                self.unsubscribe(user_id, (loop, queue))
+
+    @staticmethod
+    def _deliver(queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(RESYNC)
+
+
+# Global instance
+activity_broker = ActivityBroker()
+
+
+@receiver(activities_recorded)
+def publish_recorded(sender, activities, **kwargs):
+    for activity in activities:
+        activity_broker.publish(activity.user_id, activity.as_feed_item())
+
+
+def format_event(item):
+    return f"id: {item['id']}\nevent: activity\ndata: {json.dumps(item)}\n\n"
+
+
+def _missed_activities(user_id, last_event_id):
+    activities = (
+        UserActivity.objects.filter(user_id=user_id, id__gt=last_event_id)
+        .defer('user_agent', 'referrer')
+        .order_by('id')[:MAX_REPLAY]
+    )
+    return [activity.as_feed_item() for activity in activities]
+
+
+async def event_stream(user_id, last_event_id=None, max_lifetime=None):
+    # Subscribe before replaying so nothing written in between is lost;
+    # anything seen twice is skipped by id.
+    if max_lifetime is None:
+        max_lifetime = getattr(settings, 'ACTIVITY_STREAM_MAX_LIFETIME', 300)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max_lifetime
+    subscription = activity_broker.subscribe(user_id)
+    last_sent = last_event_id or 0
+    try:
+        yield f"retry: {RECONNECT_DELAY}\n\n"
+
+        if last_event_id is not None:
+            for item in await sync_to_async(_missed_activities)(user_id, last_event_id):
+                last_sent = item['id']
+                yield format_event(item)
+
+        queue = subscription[1]
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                # Closing lets the browser reconnect with Last-Event-ID
+                return
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=min(HEARTBEAT_INTERVAL, remaining))
+            except asyncio.TimeoutError:
+                if loop.time() < deadline:
+                    yield ": heartbeat\n\n"
+                continue
+
+            if item is RESYNC:
+                return
+            if item['id'] <= last_sent:
+                continue
+            last_sent = item['id']
+            yield format_event(item)
+    finally:
+        activity_broker.unsubscribe(user_id, subscription)
+
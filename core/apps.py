@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "core"
+
+    def ready(self):
+        # Connect signal receivers
+        from . import activity_cache, activity_stream, partitions, rollups, unread  # noqa: F401
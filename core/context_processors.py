@@ -1,14 +1,20 @@
-from .models import UserActivity
+from functools import partial
+
+from django.utils.functional import SimpleLazyObject
+
+from .activity_cache import get_recent_activities
+from .unread import get_unread_count
 
 def user_activity(request):
     """Adds user's recent activity to the template context"""
     if not request.user.is_authenticated:
         return {}
-        
-    recent_activities = UserActivity.objects.filter(
-        user=request.user
-    ).select_related('user').order_by('-timestamp')[:5]
     
+    user_id = request.user.id
+    
+    # Both values are lazy: nothing is loaded unless a template uses them,
+    # and then they come from per-user cached snapshots
     return {
-        'recent_activities': recent_activities
+        'recent_activities': SimpleLazyObject(partial(get_recent_activities, user_id)),
+        'unread_activity_count': partial(get_unread_count, user_id),
     }
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from core.rollups import DEFAULT_BATCH_SIZE, get_watermark, rebuild_rollups, recount_late_rollups, refresh_rollups
+
+
+class Command(BaseCommand):
+    help = ('Fold user activity into the daily rollup tables, starting from the stored high-water mark, '
+            'and recount recent days for activity committed out of order. Run it every few minutes.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Discard existing rollups and recount the hot activity table '
+                                 '(archived partitions are not recounted)')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+        parser.add_argument('--force-recount', action='store_true',
+                            help='Recount recent days even if the last recount is within ACTIVITY_ROLLUPS_OVERLAP')
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            self.stdout.write('Rebuilding activity rollups...')
+            processed = rebuild_rollups(batch_size=options['batch_size'])
+        else:
+            processed = refresh_rollups(batch_size=options['batch_size'])
+            recounted = recount_late_rollups(force=options['force_recount'])
+            if recounted is not None:
+                self.stdout.write(f'Recounted {recounted} recent user-days')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Folded {processed} activities into rollups (high-water mark: {get_watermark()})'
+        ))
@@ -0,0 +1,103 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse
+
+from core.activity_feed import encode_feed, feed_rows
+from core.models import UserActivity
+
+User = get_user_model()
+
+
+def original_feed_item(activity):
+    """
+    The feed entry as it was built before the values()-based path: per-row
+    dict literals for the icon and priority class, read through the model
+    """
+    priority_class = {
+        'low': 'bg-blue-100 text-blue-800',
+        'medium': 'bg-yellow-100 text-yellow-800',
+        'high': 'bg-red-100 text-red-800',
+    }.get(activity.priority, 'bg-gray-100 text-gray-800')
+    icon = {
+        'course_view': 'eye',
+        'course_progress': 'trending-up',
+        'resource_download': 'download',
+        'forum_post': 'message-square',
+        'forum_reply': 'message-circle',
+        'achievement': 'award',
+        'search': 'search',
+        'enroll': 'user-plus',
+        'complete': 'check-circle',
+        'certificate': 'file-text',
+    }.get(activity.activity_type, 'activity')
+    return {
+        'id': activity.id,
+        'type': activity.activity_type,
+        'title': activity.page_title,
+        'timestamp': activity.timestamp.isoformat(),
+        'is_read': activity.is_read,
+        'is_important': activity.is_important,
+        'progress': activity.progress,
+        'metadata': activity.metadata,
+        'priority': activity.priority,
+        'priority_class': priority_class,
+        'icon': icon,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compare the model-based and the values()-based activity feed serialization'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=50, help='Activities per feed page')
+        parser.add_argument('--iterations', type=int, default=500)
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        iterations = options['iterations']
+
+        # Everything runs in a transaction that is rolled back at the end
+        with transaction.atomic():
+            user = User.objects.create(username='bench-activity-feed')
+            UserActivity.objects.bulk_create([
+                UserActivity(
+                    user=user,
+                    activity_type=UserActivity.ACTIVITY_TYPES[i % len(UserActivity.ACTIVITY_TYPES)][0],
+                    page_url=f'http://example.com/page/{i}/',
+                    page_title=f'Page {i}',
+                    metadata={'path': f'/page/{i}/', 'query_params': {}},
+                    user_agent='Mozilla/5.0 ' * 20,
+                    referrer='http://example.com/',
+                )
+                for i in range(rows)
+            ])
+            queryset = UserActivity.objects.filter(user=user).order_by('-timestamp', '-id')[:rows]
+
+            def model_path():
+                data = [original_feed_item(activity) for activity in queryset.all()]
+                return JsonResponse({'activities': data})
+
+            def values_path():
+                return HttpResponse(encode_feed(feed_rows(queryset.all())), content_type='application/json')
+
+            results = [
+                ('model instances + JsonResponse', self._time(model_path, iterations)),
+                ('values_list + single json.dumps', self._time(values_path, iterations)),
+            ]
+            transaction.set_rollback(True)
+
+        baseline = results[0][1]
+        self.stdout.write(f'{rows} rows per page, {iterations} iterations')
+        for label, seconds in results:
+            per_call = seconds / iterations * 1000
+            self.stdout.write(f'  {label:<34} {per_call:8.3f} ms/page  ({baseline / seconds:.2f}x)')
+
+    def _time(self, func, iterations):
+        func()  # warm up
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        return time.perf_counter() - start
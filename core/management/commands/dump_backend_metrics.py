@@ -0,0 +1,47 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from services.metrics import collect_metrics
+
+
+def _ms(seconds):
+    return f'{seconds * 1000:.0f}' if seconds is not None else '-'
+
+
+class Command(BaseCommand):
+    help = 'Print the backend API metrics published by running processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help='Print the raw metrics as JSON')
+
+    def handle(self, *args, **options):
+        data = collect_metrics()
+        if options['json']:
+            self.stdout.write(json.dumps(data, indent=2, sort_keys=True))
+            return
+
+        if not data['endpoints']:
+            self.stdout.write(
+                'No backend API metrics found. Processes publish them to the cache every '
+                'BACKEND_API_METRICS_PUBLISH_INTERVAL seconds.'
+            )
+            return
+
+        self.stdout.write(f"Processes: {', '.join(sorted(data['processes']))}")
+        self.stdout.write(
+            f"{'endpoint':<44} {'requests':>8} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} "
+            f"{'retries':>7} {'KB in':>8}  statuses"
+        )
+        for label, stats in sorted(data['endpoints'].items()):
+            self.stdout.write(
+                f"{label:<44} {stats['requests']:>8} {_ms(stats['latency_p50']):>7} "
+                f"{_ms(stats['latency_p95']):>7} {_ms(stats['latency_p99']):>7} {stats['retries']:>7} "
+                f"{stats['bytes_received'] / 1024:>8.1f}  {stats['statuses']}"
+            )
+
+        self.stdout.write('')
+        for name, value in sorted(data['counters'].items()):
+            self.stdout.write(f'{name:<28} {value}')
+        if 'cache_hit_rate' in data:
+            self.stdout.write(f"{'cache_hit_rate':<28} {data['cache_hit_rate']:.1%}")
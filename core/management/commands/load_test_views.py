@@ -0,0 +1,109 @@
+import math
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from services.api_client import api_client
+from services.fake_backend import FakeBackend
+
+User = get_user_model()
+
+VIEWS = {
+    'home': '/',
+    'dashboard': '/dashboard/',
+    'search': '/search/?q=course',
+    'recommendations': '/recommendations/',
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(pct / 100 * len(sorted_values))
+    return sorted_values[max(rank, 1) - 1]
+
+
+class Command(BaseCommand):
+    help = 'Drive the backend-backed views concurrently and report throughput and latency percentiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per view')
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument('--view', action='append', dest='views', choices=sorted(VIEWS),
+                            help='Only drive this view (may be repeated)')
+        parser.add_argument('--username', default='loadtest',
+                            help='User the logged-in views run as; created if missing')
+        parser.add_argument('--fake-backend', action='store_true',
+                            help='Start an in-process fake backend and point api_client at it')
+        parser.add_argument('--latency', type=float, default=0.05, help='Fake backend latency in seconds')
+        parser.add_argument('--jitter', type=float, default=0.0)
+        parser.add_argument('--error-rate', type=float, default=0.0)
+        parser.add_argument('--description-bytes', type=int, default=500)
+
+    def handle(self, *args, **options):
+        views = options['views'] or list(VIEWS)
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests and --concurrency must be positive')
+
+        backend = None
+        if options['fake_backend']:
+            backend = FakeBackend(
+                port=0,
+                latency=options['latency'],
+                jitter=options['jitter'],
+                error_rate=options['error_rate'],
+                description_bytes=options['description_bytes'],
+            ).start()
+            api_client.base_url = backend.url
+        self.stdout.write(f'Backend API: {api_client.base_url}')
+
+        user, created = User.objects.get_or_create(username=options['username'])
+        if created:
+            user.set_unusable_password()
+            user.save(update_fields=['password'])
+        if not api_client.authenticate(options['username'], 'loadtest', user_id=user.pk):
+            self.stderr.write('Could not get backend API tokens; authenticated calls will fail')
+
+        clients = threading.local()
+
+        def hit(path):
+            client = getattr(clients, 'client', None)
+            if client is None:
+                # Failing views are counted by status rather than raised
+                client = clients.client = Client(raise_request_exception=False)
+                client.force_login(user)
+            start = time.perf_counter()
+            status = client.get(path).status_code
+            return time.perf_counter() - start, status
+
+        try:
+            for name in views:
+                self._run(name, VIEWS[name], hit, options['requests'], options['concurrency'])
+        finally:
+            if backend:
+                backend.stop()
+
+    def _run(self, name, path, hit, requests, concurrency):
+        hit(path)  # warm up
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(hit, [path] * requests))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(seconds * 1000 for seconds, _ in results)
+        statuses = defaultdict(int)
+        for _, status in results:
+            statuses[status] += 1
+        self.stdout.write(
+            f'{name:<16} {requests / elapsed:8.1f} req/s  '
+            f'p50 {percentile(latencies, 50):7.1f} ms  '
+            f'p95 {percentile(latencies, 95):7.1f} ms  '
+            f'p99 {percentile(latencies, 99):7.1f} ms  '
+            f'status {dict(sorted(statuses.items()))}'
+        )
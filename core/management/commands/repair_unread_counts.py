@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from core.unread import repair_unread_counts
+
+
+class Command(BaseCommand):
+    help = 'Recount unread activities per user and fix counters that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids',
+                            help='Only repair this user id (may be repeated)')
+
+    def handle(self, *args, **options):
+        drifted = repair_unread_counts(user_ids=options['user_ids'])
+        for user_id in drifted:
+            self.stdout.write(f'Fixed unread counter for user {user_id}')
+        self.stdout.write(self.style.SUCCESS(f'{len(drifted)} unread counters repaired'))
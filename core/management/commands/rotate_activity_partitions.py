@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from core.partitions import (
+    archive_month, drop_partition, expired_partitions, get_partition_settings,
+    months_to_archive, partition_table,
+)
+from core.rollups import refresh_rollups
+
+
+class Command(BaseCommand):
+    help = 'Move closed months of user activity into archive partitions and drop expired partitions'
+
+    def add_arguments(self, parser):
+        defaults = get_partition_settings()
+        parser.add_argument('--hot-months', type=int, default=defaults['HOT_MONTHS'],
+                            help='Months (including the current one) kept in the hot table')
+        parser.add_argument('--retention-months', type=int, default=defaults['RETENTION_MONTHS'],
+                            help='Archive partitions older than this many months are dropped')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would change')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        # Rollups only see the hot table, so fold rows in before they move
+        if not dry_run:
+            refresh_rollups()
+
+        for month in months_to_archive(hot_months=options['hot_months']):
+            if dry_run:
+                self.stdout.write(f"Would archive {month:%Y-%m} into {partition_table(month)}")
+                continue
+            moved = archive_month(month)
+            self.stdout.write(f"Archived {moved} activities into {partition_table(month)}")
+
+        for month in expired_partitions(retention_months=options['retention_months']):
+            if dry_run:
+                self.stdout.write(f"Would drop {partition_table(month)}")
+                continue
+            drop_partition(month)
+            self.stdout.write(f"Dropped {partition_table(month)}")
+
+        self.stdout.write(self.style.SUCCESS('Activity partitions are up to date'))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from services.fake_backend import FakeBackend
+
+
+class Command(BaseCommand):
+    help = 'Serve a fake backend API with configurable latency, errors and payload sizes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8001)
+        parser.add_argument('--latency', type=float, default=0.05, help='Seconds added to every request')
+        parser.add_argument('--jitter', type=float, default=0.0, help='Up to this many more seconds, at random')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Share of requests answered with 503')
+        parser.add_argument('--courses', type=int, default=200, help='Courses in the catalog')
+        parser.add_argument('--description-bytes', type=int, default=500, help='Description size per course')
+        parser.add_argument('--max-page-size', type=int, help='Cap on courses per page, whatever page_size is asked')
+
+    def handle(self, *args, **options):
+        backend = FakeBackend(
+            host=options['host'],
+            port=options['port'],
+            latency=options['latency'],
+            jitter=options['jitter'],
+            error_rate=options['error_rate'],
+            courses=options['courses'],
+            description_bytes=options['description_bytes'],
+            max_page_size=options['max_page_size'],
+        )
+        self.stdout.write(f'Fake backend API at {backend.url}; point BACKEND_API_URL at it. Quit with CONTROL-C.')
+        try:
+            backend.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            backend.server.server_close()
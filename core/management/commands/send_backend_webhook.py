@@ -0,0 +1,52 @@
+import json
+import time
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from services.invalidation import (
+    ENTITY_TYPES, SIGNATURE_HEADER, TIMESTAMP_HEADER, get_webhook_settings, parse_entities, sign,
+)
+
+
+def _entity(spec):
+    """'course:12' or 'lesson:5@12' (lesson 5 of course 12) -> entity dict"""
+    kind, _, rest = spec.partition(':')
+    entity_id, _, course = rest.partition('@')
+    if kind not in ENTITY_TYPES or not entity_id:
+        raise CommandError(f"Bad entity {spec!r}; expected TYPE:ID[@COURSE] with TYPE one of {', '.join(ENTITY_TYPES)}")
+    entity = {'type': kind, 'id': int(entity_id) if entity_id.isdigit() else entity_id}
+    if course:
+        entity['course'] = int(course) if course.isdigit() else course
+    return entity
+
+
+class Command(BaseCommand):
+    help = 'Send a signed backend change webhook, standing in for the backend API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('entities', nargs='+', help='Changed entities as TYPE:ID[@COURSE], e.g. course:12 lesson:5@12')
+        parser.add_argument('--url', default='http://127.0.0.1:8000/api/backend-webhook/')
+        parser.add_argument('--secret', help='Signing secret (default: BACKEND_WEBHOOK["SECRET"])')
+
+    def handle(self, *args, **options):
+        webhook = get_webhook_settings()
+        secret = options['secret'] or webhook['SECRET']
+        if not secret:
+            raise CommandError('No signing secret: set BACKEND_WEBHOOK_SECRET or pass --secret')
+
+        payload = {'entities': [_entity(spec) for spec in options['entities']]}
+        parse_entities(payload, webhook['MAX_ENTITIES'])
+        body = json.dumps(payload).encode()
+        timestamp = str(int(time.time()))
+        try:
+            response = requests.post(options['url'], data=body, timeout=10, headers={
+                'Content-Type': 'application/json',
+                TIMESTAMP_HEADER: timestamp,
+                SIGNATURE_HEADER: sign(body, timestamp, secret),
+            })
+        except requests.RequestException as e:
+            raise CommandError(f'Could not reach {options["url"]}: {e}')
+        if response.status_code != 200:
+            raise CommandError(f'Webhook failed with HTTP {response.status_code}: {response.text[:200]}')
+        self.stdout.write(self.style.SUCCESS(f"Purged tags: {', '.join(response.json()['purged_tags'])}"))
@@ -1,4 +1,5 @@
 from django.utils import timezone
+from .activity_buffer import activity_buffer
 from .models import UserActivity
 
 class UserActivityMiddleware:
@@ -25,8 +26,8 @@ class UserActivityMiddleware:
         )
 
     def _track_activity(self, request):
-        """Record the page view activity"""
-        UserActivity.record_activity(
+        """Queue the page view activity; the buffer writes it in bulk later"""
+        activity_buffer.add(UserActivity.build_activity(
             request=request,
             activity_type='page_view',
             page_title=self._get_page_title(request),
@@ -35,7 +36,7 @@ class UserActivityMiddleware:
                 'path': request.path,
                 'query_params': dict(request.GET),
             }
-        )
+        ))
 
     def _get_page_title(self, request):
         """Extract page title from the view's context if available"""
@@ -0,0 +1,19 @@
+# Generated by Django 5.1 on 2026-10-18 06:21
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_useractivity_is_important_useractivity_is_read_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="useractivity",
+            name="timestamp",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
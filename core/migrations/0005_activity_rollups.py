@@ -0,0 +1,38 @@
+# Generated by Django 5.1 on 2026-10-18 06:23
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_useractivity_timestamp_default"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RollupWatermark",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=50, unique=True)),
+                ("last_id", models.BigIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="ActivityDailyRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("activity_type", models.CharField(choices=[("page_view", "Page View"), ("course_view", "Course View"), ("course_progress", "Course Progress"), ("resource_download", "Resource Downloaded"), ("forum_post", "Forum Post"), ("forum_reply", "Forum Reply"), ("achievement", "Achievement Unlocked"), ("search", "Search"), ("enroll", "Course Enrollment"), ("complete", "Course Completion"), ("certificate", "Certificate Earned")], max_length=20)),
+                ("day", models.DateField()),
+                ("count", models.PositiveIntegerField(default=0)),
+                ("user", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="activity_rollups", to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                "constraints": [models.UniqueConstraint(fields=("user", "day", "activity_type"), name="unique_daily_activity_rollup")],
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1 on 2026-10-18 06:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("core", "0005_activity_rollups"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="useractivity",
+            index=models.Index(fields=["user", "-timestamp", "-id"], name="core_userac_user_id_bc3179_idx"),
+        ),
+    ]
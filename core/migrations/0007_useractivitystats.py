@@ -0,0 +1,27 @@
+# Generated by Django 5.1 on 2026-10-18 06:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("core", "0006_useractivity_feed_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UserActivityStats",
+            fields=[
+                ("user", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name="activity_stats", serialize=False, to=settings.AUTH_USER_MODEL)),
+                ("unread_count", models.PositiveIntegerField(default=0)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "verbose_name_plural": "User Activity Stats",
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-18 06:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_useractivitystats"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="useractivitystats",
+            name="version",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
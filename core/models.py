@@ -1,6 +1,11 @@
 from django.db import models
 from django.utils import timezone
 
+from .activity_feed import (
+    ACTIVITY_ICONS, DEFAULT_ICON, DEFAULT_PRIORITY_CLASS, FEED_FIELDS, PRIORITY_CLASSES, feed_item,
+)
+from .signals import activities_read, activities_recorded
+
 class Contact(models.Model):
     PRIORITY_CHOICES = [
         ('low', 'Low'),
@@ -23,7 +28,24 @@ class Contact(models.Model):
     class Meta:
         ordering = ['-created_at']
 
-class UserActivity(models.Model):
+class ActivityDisplayMixin:
+    """
+    Presentation helpers shared by UserActivity and its archive partitions
+    """
+
+    @property
+    def priority_class(self):
+        return PRIORITY_CLASSES.get(self.priority, DEFAULT_PRIORITY_CLASS)
+
+    @property
+    def icon(self):
+        return ACTIVITY_ICONS.get(self.activity_type, DEFAULT_ICON)
+
+    def as_feed_item(self):
+        """JSON-ready representation used by the activity feed and stream"""
+        return feed_item(tuple(getattr(self, name) for name in FEED_FIELDS))
+
+class UserActivity(ActivityDisplayMixin, models.Model):
     """
     Tracks user interactions with the platform
     """
@@ -55,7 +77,7 @@ class UserActivity(models.Model):
     priority = models.CharField(max_length=10, choices=PRIORITY_LEVELS, default='medium')
     is_important = models.BooleanField(default=False)
     is_read = models.BooleanField(default=False)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    timestamp = models.DateTimeField(default=timezone.now)
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.TextField(blank=True)
     referrer = models.URLField(blank=True)
@@ -76,54 +98,94 @@ class UserActivity(models.Model):
         indexes = [
             models.Index(fields=['user', 'activity_type']),
             models.Index(fields=['timestamp']),
+            # Keyset pagination of the activity feed
+            models.Index(fields=['user', '-timestamp', '-id']),
         ]
 
     def __str__(self):
         return f"{self.user.username} - {self.get_activity_type_display()} - {self.page_title}"
         
-    @property
-    def priority_class(self):
-        return {
-            'low': 'bg-blue-100 text-blue-800',
-            'medium': 'bg-yellow-100 text-yellow-800',
-            'high': 'bg-red-100 text-red-800',
-        }.get(self.priority, 'bg-gray-100 text-gray-800')
-        
-    @property
-    def icon(self):
-        icons = {
-            'course_view': 'eye',
-            'course_progress': 'trending-up',
-            'resource_download': 'download',
-            'forum_post': 'message-square',
-            'forum_reply': 'message-circle',
-            'achievement': 'award',
-            'search': 'search',
-            'enroll': 'user-plus',
-            'complete': 'check-circle',
-            'certificate': 'file-text',
-        }
-        return icons.get(self.activity_type, 'activity')
-        
     def mark_as_read(self):
+        # Conditional UPDATE so the unread counter only moves on a real change
+        updated = type(self).objects.filter(pk=self.pk, is_read=False).update(is_read=True)
         self.is_read = True
-        self.save(update_fields=['is_read'])
+        if updated:
+            activities_read.send(sender=type(self), user_id=self.user_id, count=updated)
 
     @classmethod
-    def record_activity(cls, request, activity_type, **kwargs):
+    def build_activity(cls, request, activity_type, **kwargs):
         """
-        Helper method to record user activity
+        Build an unsaved activity for the current request
         """
-        if not request.user.is_authenticated:
-            return None
-            
-        return cls.objects.create(
-            user=request.user,
+        return cls(
+            user_id=request.user.pk,
             activity_type=activity_type,
-            page_url=request.build_absolute_uri(),
-            page_title=kwargs.get('page_title', ''),
+            page_url=cls._truncate('page_url', request.build_absolute_uri()),
+            page_title=cls._truncate('page_title', kwargs.get('page_title', '')),
             metadata=kwargs.get('metadata', {}),
             ip_address=request.META.get('REMOTE_ADDR'),
             user_agent=request.META.get('HTTP_USER_AGENT', ''),
-            referrer=request.META.get('HTTP_REFERER', '')
+            referrer=cls._truncate('referrer', request.META.get('HTTP_REFERER', ''))
         )
+
+    @classmethod
+    def _truncate(cls, field_name, value):
+        # Request data can be any length; an over-long value would fail the
+        # whole INSERT on databases that enforce max_length
+        return value[:cls._meta.get_field(field_name).max_length]
+
+    @classmethod
+    def record_activity(cls, request, activity_type, **kwargs):
+        """
+        Helper method to record user activity
+        """
+        if not request.user.is_authenticated:
+            return None
+
+        activity = cls.build_activity(request, activity_type, **kwargs)
+        activity.save()
+        activities_recorded.send(sender=cls, activities=[activity], buffered=False)
+        return activity
+
+class ActivityDailyRollup(models.Model):
+    """
+    Per-user, per-type daily activity counts maintained by core.rollups
+    """
+    user = models.ForeignKey('auth.User', on_delete=models.CASCADE, related_name='activity_rollups')
+    activity_type = models.CharField(max_length=20, choices=UserActivity.ACTIVITY_TYPES)
+    day = models.DateField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'day', 'activity_type'], name='unique_daily_activity_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.activity_type} - {self.day}: {self.count}"
+
+class RollupWatermark(models.Model):
+    """
+    Highest UserActivity id already folded into a rollup
+    """
+    name = models.CharField(max_length=50, unique=True)
+    last_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.last_id}"
+
+class UserActivityStats(models.Model):
+    """
+    Per-user activity counters, kept up to date incrementally by core.unread
+    """
+    user = models.OneToOneField('auth.User', on_delete=models.CASCADE, primary_key=True, related_name='activity_stats')
+    unread_count = models.PositiveIntegerField(default=0)
+    version = models.PositiveBigIntegerField(default=0)  # bumped on every activity change
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'User Activity Stats'
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread_count} unread"
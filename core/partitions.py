@@ -0,0 +1,237 @@
+"""
+Monthly archive partitions for UserActivity.
+
+The core_useractivity table only keeps recent ("hot") activity. Closed months
+are moved into their own tables named core_useractivity_YYYYMM, so a read only
+touches the partitions its date window covers and retention can drop a whole
+month with a single DROP TABLE instead of deleting rows.
+
+Archived rows keep their original ids, are read-only and are deleted along
+with their user.
+"""
+import logging
+import re
+import threading
+from datetime import datetime
+
+from django.apps.registry import Apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, models, transaction
+from django.db.models import Count
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import ActivityDisplayMixin, UserActivity
+from .unread import adjust_unread
+
+logger = logging.getLogger(__name__)
+
+PARTITION_PREFIX = 'core_useractivity_'
+PARTITION_TABLE_RE = re.compile(r'^core_useractivity_(\d{4})(\d{2})$')
+PARTITION_LIST_CACHE_KEY = 'activity_partition_months'
+PARTITION_LIST_CACHE_TIMEOUT = 300  # 5 minutes
+
+DEFAULT_SETTINGS = {
+    'HOT_MONTHS': 2,  # current month plus the previous one stay in the hot table
+    'RETENTION_MONTHS': 12,
+}
+
+# Partition models live in their own registry so they never show up in
+# migrations or in the project's app registry.
+partition_apps = Apps()
+_partition_models = {}
+_partition_models_lock = threading.Lock()
+
+
+def get_partition_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'ACTIVITY_PARTITIONS', {})}
+
+
+def make_month(year, month):
+    start = datetime(year, month, 1)
+    return timezone.make_aware(start) if settings.USE_TZ else start
+
+
+def month_start(value):
+    """First instant of the month containing ``value``"""
+    value = timezone.localtime(value) if timezone.is_aware(value) else value
+    return make_month(value.year, value.month)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return make_month(index // 12, index % 12 + 1)
+
+
+def partition_table(month):
+    return f"{PARTITION_PREFIX}{month.year:04d}{month.month:02d}"
+
+
+def get_partition_model(month):
+    """
+    Return an unmanaged model bound to the archive table for ``month``
+    """
+    table = partition_table(month)
+    with _partition_models_lock:
+        if table in _partition_models:
+            return _partition_models[table]
+
+        attrs = {'__module__': __name__}
+        for field in UserActivity._meta.local_fields:
+            if field.primary_key:
+                attrs[field.name] = models.BigIntegerField(primary_key=True)
+            elif field.is_relation:
+                # Archives keep the raw foreign key values without constraints
+                attrs[field.attname] = models.BigIntegerField(null=field.null, db_column=field.column)
+            else:
+                name, path, args, kwargs = field.deconstruct()
+                attrs[field.name] = field.__class__(*args, **kwargs)
+
+        attrs['Meta'] = type('Meta', (), {
+            'apps': partition_apps,
+            'app_label': 'core',
+            'db_table': table,
+            'managed': False,
+            'ordering': ['-timestamp'],
+            'indexes': [models.Index(fields=['user_id', '-timestamp', '-id'], name=f"cua_{month.year:04d}{month.month:02d}_feed")],
+        })
+        model = type(f"UserActivity{month.year:04d}{month.month:02d}", (ActivityDisplayMixin, models.Model), attrs)
+        _partition_models[table] = model
+        return model
+
+
+def archived_months(refresh=False):
+    """
+    Months that currently have an archive table, oldest first
+    """
+    months = None if refresh else cache.get(PARTITION_LIST_CACHE_KEY)
+    if months is None:
+        months = []
+        for table in connection.introspection.table_names():
+            match = PARTITION_TABLE_RE.match(table)
+            if match:
+                months.append((int(match.group(1)), int(match.group(2))))
+        months.sort()
+        cache.set(PARTITION_LIST_CACHE_KEY, months, PARTITION_LIST_CACHE_TIMEOUT)
+    return [make_month(year, month) for year, month in months]
+
+
+class ActivityPartitionRouter:
+    """
+    Picks the UserActivity tables a query needs for a date window
+    """
+
+    def querysets(self, since=None, until=None):
+        """
+        Querysets covering [since, until), newest partition first.
+
+        The hot table always comes first; archive partitions are only included
+        when the window reaches into their month. Partitions do not overlap,
+        so results can be concatenated in this order.
+        """
+        querysets = [UserActivity.objects.all()]
+        for month in reversed(archived_months()):
+            if since is not None and add_months(month, 1) <= since:
+                break
+            if until is not None and month >= until:
+                continue
+            querysets.append(get_partition_model(month).objects.all())
+        return querysets
+
+
+router = ActivityPartitionRouter()
+
+
+def _quoted_columns():
+    return ', '.join(connection.ops.quote_name(f.column) for f in UserActivity._meta.local_fields)
+
+
+def ensure_partition(month):
+    model = get_partition_model(month)
+    if model._meta.db_table not in connection.introspection.table_names():
+        with connection.schema_editor() as schema_editor:
+            schema_editor.create_model(model)
+    return model
+
+
+def archive_month(month):
+    """
+    Move one month of rows out of the hot table into its archive partition.
+
+    Uses one INSERT ... SELECT and one range DELETE. Returns rows moved.
+    """
+    model = ensure_partition(month)
+    qn = connection.ops.quote_name
+    hot_table = qn(UserActivity._meta.db_table)
+    columns = _quoted_columns()
+    window = [
+        connection.ops.adapt_datetimefield_value(month),
+        connection.ops.adapt_datetimefield_value(add_months(month, 1)),
+    ]
+    where = f"{qn('timestamp')} >= %s AND {qn('timestamp')} < %s"
+
+    # Archived rows can no longer be marked read, so they leave the counters
+    unread = (
+        UserActivity.objects.filter(timestamp__gte=month, timestamp__lt=add_months(month, 1), is_read=False)
+        .values('user_id').annotate(total=Count('id')).order_by()
+    )
+
+    with transaction.atomic():
+        for row in unread:
+            adjust_unread(row['user_id'], -row['total'])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {qn(model._meta.db_table)} ({columns}) "
+                f"SELECT {columns} FROM {hot_table} WHERE {where}",
+                window,
+            )
+            cursor.execute(f"DELETE FROM {hot_table} WHERE {where}", window)
+            moved = cursor.rowcount
+
+    cache.delete(PARTITION_LIST_CACHE_KEY)
+    return moved
+
+
+def drop_partition(month):
+    model = get_partition_model(month)
+    with connection.schema_editor() as schema_editor:
+        schema_editor.delete_model(model)
+    cache.delete(PARTITION_LIST_CACHE_KEY)
+
+
+def months_to_archive(hot_months=None, now=None):
+    """
+    Closed months that still have rows in the hot table, oldest first
+    """
+    hot_months = hot_months or get_partition_settings()['HOT_MONTHS']
+    cutoff = add_months(month_start(now or timezone.now()), -(hot_months - 1))
+    oldest = UserActivity.objects.filter(timestamp__lt=cutoff).order_by('timestamp').values_list('timestamp', flat=True).first()
+    if oldest is None:
+        return []
+
+    months = []
+    month = month_start(oldest)
+    while month < cutoff:
+        # Gaps in the history would only leave empty archive tables behind
+        if UserActivity.objects.filter(timestamp__gte=month, timestamp__lt=add_months(month, 1)).exists():
+            months.append(month)
+        month = add_months(month, 1)
+    return months
+
+
+def expired_partitions(retention_months=None, now=None):
+    """
+    Archive partitions entirely older than the retention window
+    """
+    retention_months = retention_months or get_partition_settings()['RETENTION_MONTHS']
+    cutoff = add_months(month_start(now or timezone.now()), -retention_months)
+    return [month for month in archived_months(refresh=True) if add_months(month, 1) <= cutoff]
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def delete_archived_activity(sender, instance, **kwargs):
+    # Archived rows have no foreign key to cascade from, so remove them here
+    for month in archived_months():
+        get_partition_model(month).objects.filter(user_id=instance.pk).delete()
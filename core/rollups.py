@@ -0,0 +1,222 @@
+"""
+Incremental daily rollups of UserActivity.
+
+ActivityDailyRollup holds one count per (user, activity_type, day). Rows are
+folded in by id: everything up to the watermark's ``last_id`` has been counted,
+so range queries read the rollups and only count the raw rows above it.
+
+With concurrent writers ids are not committed in order: a transaction holding
+a lower id can commit after a higher one was folded in, and the fold skips it.
+recount_late_rollups() repairs that by recounting the days of recent rows; it
+assumes no write commits more than ACTIVITY_ROLLUPS_OVERLAP seconds after its
+timestamp, and late rows are missing from the counts until it runs.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import ActivityDailyRollup, RollupWatermark, UserActivity
+from .signals import activities_recorded
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = 'activity_daily'
+RECOUNT_NAME = 'activity_daily_recount'  # updated_at: when the last recount started
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_OVERLAP = 300  # seconds
+
+
+def get_watermark():
+    return RollupWatermark.objects.filter(name=WATERMARK_NAME).values_list('last_id', flat=True).first() or 0
+
+
+def refresh_rollups(batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Fold activities above the watermark into the daily rollups.
+
+    Works in id-ordered batches, each in its own transaction together with the
+    watermark update. Returns the number of activities folded in.
+    """
+    processed = 0
+    while True:
+        with transaction.atomic():
+            watermark, _ = RollupWatermark.objects.select_for_update().get_or_create(name=WATERMARK_NAME)
+            ids = list(
+                UserActivity.objects.filter(id__gt=watermark.last_id)
+                .order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+
+            totals = (
+                UserActivity.objects.filter(id__gt=watermark.last_id, id__lte=ids[-1])
+                .annotate(day=TruncDate('timestamp'))
+                .values('user_id', 'activity_type', 'day')
+                .annotate(total=Count('id'))
+                .order_by()
+            )
+            _add_to_rollups(totals)
+
+            watermark.last_id = ids[-1]
+            watermark.save(update_fields=['last_id', 'updated_at'])
+
+        processed += len(ids)
+        if len(ids) < batch_size:
+            break
+    return processed
+
+
+def rebuild_rollups(batch_size=DEFAULT_BATCH_SIZE):
+    """Throw the rollups away and recount every activity in the hot table"""
+    with transaction.atomic():
+        ActivityDailyRollup.objects.all().delete()
+        RollupWatermark.objects.filter(name=WATERMARK_NAME).delete()
+    return refresh_rollups(batch_size=batch_size)
+
+
+def _add_to_rollups(totals):
+    totals = {(row['user_id'], row['activity_type'], row['day']): row['total'] for row in totals}
+    if not totals:
+        return
+
+    existing = ActivityDailyRollup.objects.filter(
+        user_id__in={key[0] for key in totals},
+        day__in={key[2] for key in totals},
+    )
+    to_update = []
+    for rollup in existing:
+        key = (rollup.user_id, rollup.activity_type, rollup.day)
+        if key in totals:
+            rollup.count += totals.pop(key)
+            to_update.append(rollup)
+
+    ActivityDailyRollup.objects.bulk_update(to_update, ['count'])
+    ActivityDailyRollup.objects.bulk_create([
+        ActivityDailyRollup(user_id=user_id, activity_type=activity_type, day=day, count=total)
+        for (user_id, activity_type, day), total in totals.items()
+    ])
+
+
+def recount_late_rollups(overlap=None, force=False):
+    """
+    Recount the days of activities stamped since ``overlap`` seconds before
+    the previous recount, picking up rows the fold skipped because they
+    committed after a higher id.
+
+    Runs at most once per ``overlap`` seconds unless ``force`` is set; meant
+    for the backfill_activity_rollups command, not the buffer's flush path.
+    Returns the number of (user, day) pairs recounted, or None if skipped.
+    """
+    if overlap is None:
+        overlap = getattr(settings, 'ACTIVITY_ROLLUPS_OVERLAP', DEFAULT_OVERLAP)
+    started = timezone.now()
+    with transaction.atomic():
+        # Holding the watermark keeps refresh_rollups out while counts are replaced
+        watermark = RollupWatermark.objects.select_for_update().filter(name=WATERMARK_NAME).first()
+        if watermark is None:
+            return 0
+        recount, created = RollupWatermark.objects.select_for_update().get_or_create(name=RECOUNT_NAME)
+        previous = started if created else recount.updated_at
+        if not force and not created and started - previous < timedelta(seconds=overlap):
+            return None
+
+        since = previous - timedelta(seconds=overlap)
+        pairs = _recount_rollups(
+            UserActivity.objects.filter(id__lte=watermark.last_id, timestamp__gte=since),
+            watermark.last_id,
+        )
+        # update() keeps ``started``, which auto_now on save() would overwrite
+        RollupWatermark.objects.filter(pk=recount.pk).update(last_id=watermark.last_id, updated_at=started)
+    return pairs
+
+
+def _day_start(day):
+    start = datetime.combine(day, time.min)
+    return timezone.make_aware(start) if settings.USE_TZ else start
+
+
+def _recount_rollups(activities, last_id):
+    """
+    Recount the rollups of every (user, day) that ``activities`` fall on from
+    the rows up to ``last_id``, replacing what was folded in before. Returns
+    the number of (user, day) pairs recounted.
+    """
+    pairs = set(
+        activities.annotate(day=TruncDate('timestamp')).values_list('user_id', 'day').distinct().order_by()
+    )
+    if not pairs:
+        return 0
+    users, days = {pair[0] for pair in pairs}, {pair[1] for pair in pairs}
+
+    # A timestamp range, unlike a filter on TruncDate, can use the
+    # (user, timestamp) index
+    totals = (
+        UserActivity.objects.filter(
+            id__lte=last_id, user_id__in=users,
+            timestamp__gte=_day_start(min(days)), timestamp__lt=_day_start(max(days) + timedelta(days=1)),
+        )
+        .annotate(day=TruncDate('timestamp'))
+        .values('user_id', 'activity_type', 'day')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    totals = {
+        (row['user_id'], row['activity_type'], row['day']): row['total']
+        for row in totals if (row['user_id'], row['day']) in pairs
+    }
+
+    to_update = []
+    for rollup in ActivityDailyRollup.objects.filter(user_id__in=users, day__in=days):
+        if (rollup.user_id, rollup.day) not in pairs:
+            continue
+        count = totals.pop((rollup.user_id, rollup.activity_type, rollup.day), 0)
+        if rollup.count != count:
+            rollup.count = count
+            to_update.append(rollup)
+
+    ActivityDailyRollup.objects.bulk_update(to_update, ['count'])
+    ActivityDailyRollup.objects.bulk_create([
+        ActivityDailyRollup(user_id=user_id, activity_type=activity_type, day=day, count=total)
+        for (user_id, activity_type, day), total in totals.items()
+    ])
+    return len(pairs)
+
+
+def activity_counts(user, start, end, activity_type=None):
+    """
+    Activity counts per type for the days ``start`` through ``end`` (inclusive dates)
+    """
+    watermark = get_watermark()
+
+    rollups = ActivityDailyRollup.objects.filter(user=user, day__range=(start, end))
+    tail = UserActivity.objects.filter(user=user, id__gt=watermark, timestamp__date__range=(start, end))
+    if activity_type is not None:
+        rollups = rollups.filter(activity_type=activity_type)
+        tail = tail.filter(activity_type=activity_type)
+
+    counts = defaultdict(int)
+    for row in rollups.values('activity_type').annotate(total=Sum('count')).order_by():
+        counts[row['activity_type']] += row['total']
+    for row in tail.values('activity_type').annotate(total=Count('id')).order_by():
+        counts[row['activity_type']] += row['total']
+    return dict(counts)
+
+
+def activity_count(user, start, end, activity_type=None):
+    """Total activities for the days ``start`` through ``end`` (inclusive dates)"""
+    return sum(activity_counts(user, start, end, activity_type=activity_type).values())
+
+
+@receiver(activities_recorded)
+def refresh_after_flush(sender, activities, buffered=False, **kwargs):
+    # Only the buffer's background flusher folds rows in as it goes, so the
+    # request path never pays for the rollup update.
+    if buffered and getattr(settings, 'ACTIVITY_ROLLUPS_REFRESH_ON_FLUSH', True):
+        refresh_rollups()
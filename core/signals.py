@@ -0,0 +1,11 @@
+from django.dispatch import Signal
+
+# Sent after UserActivity rows have been written, either directly by
+# UserActivity.record_activity or in bulk by the activity buffer.
+# Receivers get ``activities``: a list of saved UserActivity instances, and
+# ``buffered``: True when sent from the buffer's background flusher.
+activities_recorded = Signal()
+
+# Sent after activities were marked read. Receivers get ``user_id`` and
+# ``count``: how many of that user's unread activities changed state.
+activities_read = Signal()
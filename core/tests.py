@@ -1,3 +1,301 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import F
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from services.invalidation import sign
+
+from .activity_buffer import ActivityBuffer
+from .activity_stream import RECONNECT_DELAY, event_stream
+from .models import UserActivity, UserActivityStats
+from .partitions import (
+    add_months, archive_month, archived_months, drop_partition, expired_partitions, month_start,
+    months_to_archive, router,
+)
+from .rollups import activity_count, get_watermark, recount_late_rollups, refresh_rollups
+from .views_activity import encode_cursor
+
+SECRET = 'test-secret'
+
+
+@override_settings(BACKEND_WEBHOOK={'SECRET': SECRET})
+class BackendWebhookTests(TestCase):
+    url = '/api/backend-webhook/'
+
+    def setUp(self):
+        # The replica refresh would call the backend; it is covered in courses.tests
+        patcher = mock.patch('courses.sync._refresh_executor')
+        self.refresh_executor = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def post(self, payload, timestamp=None, secret=SECRET, signature=None):
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        timestamp = str(int(time.time()) if timestamp is None else timestamp)
+        return self.client.post(
+            self.url, body, content_type='application/json',
+            HTTP_X_WEBHOOK_TIMESTAMP=timestamp,
+            HTTP_X_WEBHOOK_SIGNATURE=signature or sign(body, timestamp, secret),
+        )
+
+    def test_purges_tags_of_changed_entities(self):
+        response = self.post({'entities': [{'type': 'course', 'id': 3}, {'type': 'lesson', 'id': 7, 'course': 3}]})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['purged_tags'], [
+            'course:3', 'course:3:lessons', 'course:3:quizzes', 'courses', 'lesson:7',
+        ])
+        self.refresh_executor.submit.assert_called_once()
+
+    def test_rejects_wrong_signature(self):
+        response = self.post({'entities': [{'type': 'course', 'id': 3}]}, secret='other-secret')
+        self.assertEqual(response.status_code, 401)
+
+    def test_rejects_stale_timestamp(self):
+        response = self.post({'entities': [{'type': 'course', 'id': 3}]}, timestamp=int(time.time()) - 3600)
+        self.assertEqual(response.status_code, 401)
+
+    def test_rejects_everything_without_a_secret(self):
+        with self.settings(BACKEND_WEBHOOK={'SECRET': ''}):
+            response = self.post({'entities': [{'type': 'course', 'id': 3}]}, secret='')
+        self.assertEqual(response.status_code, 401)
+
+    def test_rejects_malformed_payload(self):
+        for payload in (b'not json', {'entities': []}, {'entities': [{'type': 'teacher', 'id': 1}]},
+                        {'entities': [{'type': 'course', 'id': True}]}):
+            with self.subTest(payload=payload):
+                self.assertEqual(self.post(payload).status_code, 400)
+
+    def test_rejects_get(self):
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+
+
+class ActivityStreamTests(TestCase):
+    def test_disabled_stream_answers_no_content(self):
+        user = User.objects.create_user('streamer', password='pw')
+        self.client.force_login(user)
+        with self.settings(ACTIVITY_STREAM_ENABLED=False):
+            response = self.client.get('/api/activities/stream/')
+        self.assertEqual(response.status_code, 204)
+
+    async def test_stream_closes_after_max_lifetime(self):
+        events = [event async for event in event_stream(user_id=1, max_lifetime=0.05)]
+        self.assertEqual(events, [f"retry: {RECONNECT_DELAY}\n\n"])
+
+
+class ActivityFeedTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('reader', password='pw')
+        self.client.force_login(self.user)
+        now = timezone.now()
+        self.activities = [
+            UserActivity.objects.create(user=self.user, activity_type='course_view', timestamp=now - timedelta(minutes=i))
+            for i in range(5)
+        ]
+
+    def mark_read(self, payload):
+        return self.client.post('/api/activities/mark-read/', json.dumps(payload), content_type='application/json')
+
+    def test_cursor_pages_through_the_feed_without_gaps(self):
+        ids = []
+        url = '/api/activities/'
+        with mock.patch('core.views_activity.ACTIVITY_PAGE_SIZE', 2):
+            while url:
+                data = self.client.get(url).json()
+                ids += [activity['id'] for activity in data['activities']]
+                url = f"/api/activities/?cursor={data['next']}" if data['next'] else None
+        self.assertEqual(ids, [activity.id for activity in self.activities])
+
+    def test_unchanged_feed_is_answered_with_304(self):
+        etag = self.client.get('/api/activities/')['ETag']
+        self.assertEqual(self.client.get('/api/activities/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.mark_read({'ids': [self.activities[0].id]})
+        self.assertEqual(self.client.get('/api/activities/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_etag_follows_version_changes_made_elsewhere(self):
+        etag = self.client.get('/api/activities/')['ETag']
+        # Another worker bumped the version; nothing in this process's cache was dropped
+        UserActivityStats.objects.filter(pk=self.user.pk).update(version=F('version') + 1)
+        self.assertEqual(self.client.get('/api/activities/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_unread_count_cache_is_dropped_on_commit(self):
+        self.assertEqual(self.client.get('/api/activities/unread-count/').json(), {'unread_count': 5})
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.mark_read({'ids': [self.activities[0].id]})
+            self.assertEqual(self.client.get('/api/activities/unread-count/').json(), {'unread_count': 5})
+        self.assertTrue(callbacks)
+        self.assertEqual(self.client.get('/api/activities/unread-count/').json(), {'unread_count': 4})
+
+    def test_malformed_cursor_is_rejected(self):
+        self.assertEqual(self.client.get('/api/activities/?cursor=not-a-cursor').status_code, 400)
+
+    def test_marks_listed_ids_read(self):
+        response = self.mark_read({'ids': [self.activities[0].id, self.activities[1].id]})
+        self.assertEqual(response.json(), {'status': 'success', 'updated': 2})
+
+    def test_marks_up_to_a_cursor_read(self):
+        cursor = encode_cursor(self.activities[2].timestamp, self.activities[2].id)
+        response = self.mark_read({'up_to': cursor})
+        self.assertEqual(response.json()['updated'], 3)
+        self.assertFalse(UserActivity.objects.get(id=self.activities[1].id).is_read)
+
+    def test_invalid_mark_read_payloads_are_rejected(self):
+        for payload in ({'ids': [True]}, {'ids': 'x'}, {'ids': [1.5]}, {'up_to': 5}, {'up_to': None},
+                        {'up_to': ['x']}, {'up_to': 'garbage'}, {}, [1, 2]):
+            with self.subTest(payload=payload):
+                self.assertEqual(self.mark_read(payload).status_code, 400)
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('counter', password='pw')
+        self.today = timezone.localdate()
+
+    def record(self, **kwargs):
+        return UserActivity.objects.create(user=self.user, activity_type='course_view', **kwargs)
+
+    def test_refresh_folds_new_rows_once(self):
+        for _ in range(3):
+            self.record()
+        self.assertEqual(refresh_rollups(), 3)
+        self.assertEqual(refresh_rollups(), 0)
+        self.assertEqual(activity_count(self.user, self.today, self.today), 3)
+
+    def test_rows_committed_out_of_id_order_are_counted(self):
+        first = self.record()
+        self.record(id=first.id + 2)
+        refresh_rollups()
+        self.assertEqual(get_watermark(), first.id + 2)
+
+        # A concurrent transaction holding the lower id commits afterwards
+        self.record(id=first.id + 1)
+        self.assertEqual(refresh_rollups(), 0)
+        self.assertEqual(activity_count(self.user, self.today, self.today), 2)
+
+        self.assertEqual(recount_late_rollups(), 1)
+        self.assertEqual(activity_count(self.user, self.today, self.today), 3)
+
+    def test_recount_runs_at_most_once_per_overlap(self):
+        self.record()
+        refresh_rollups()
+        self.assertEqual(recount_late_rollups(), 1)
+        self.assertIsNone(recount_late_rollups())
+        self.assertEqual(recount_late_rollups(force=True), 1)
+
+
+class ActivityBufferTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('buffered', password='pw')
+
+    def test_inline_writes_do_not_refresh_rollups(self):
+        buffer = ActivityBuffer(enabled=False)
+        with mock.patch('core.rollups.refresh_rollups') as refresh:
+            self.assertTrue(buffer.add(UserActivity(user=self.user, activity_type='page_view')))
+        refresh.assert_not_called()
+        self.assertEqual(UserActivity.objects.filter(user=self.user).count(), 1)
+
+    def test_bad_row_does_not_lose_the_rest_of_the_batch(self):
+        buffer = ActivityBuffer()
+        batch = [UserActivity(user=self.user, activity_type='page_view') for _ in range(3)]
+        batch.insert(1, UserActivity(user=self.user, activity_type=None))
+        with self.assertLogs('core.activity_buffer', 'ERROR'):
+            self.assertEqual(buffer._write(batch), 3)
+        self.assertEqual(UserActivity.objects.filter(user=self.user).count(), 3)
+
+    def test_long_request_values_are_truncated(self):
+        request = RequestFactory().get('/courses/' + 'x' * 300, HTTP_REFERER='https://example.com/' + 'y' * 300)
+        request.user = self.user
+        activity = UserActivity.build_activity(request, 'page_view', page_title='t' * 300)
+        self.assertEqual((len(activity.page_url), len(activity.referrer), len(activity.page_title)), (200, 200, 200))
+
+    def test_dropped_count_is_exact_across_threads(self):
+        buffer = ActivityBuffer(max_queue_size=1, overload_sample_rate=1)
+        buffer.queue.put_nowait(UserActivity(user=self.user, activity_type='page_view'))
+        with mock.patch.object(buffer, '_ensure_started'), self.assertLogs('core.activity_buffer', 'WARNING'):
+            threads = [
+                threading.Thread(target=lambda: [
+                    buffer.add(UserActivity(user=self.user, activity_type='page_view')) for _ in range(50)
+                ])
+                for _ in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(buffer.dropped, 400)
+
+
+class PartitionTests(TransactionTestCase):
+    # DDL cannot run inside the per-test transaction on SQLite
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('archived', password='pw')
+        self.current = month_start(timezone.now())
+        self.old = add_months(self.current, -4)
+        for day in (1, 2):
+            self.record(self.old + timedelta(days=day))
+        self.record(timezone.now())
+        self.addCleanup(self.drop_partitions)
+
+    def record(self, timestamp):
+        return UserActivity.objects.create(user=self.user, activity_type='page_view', timestamp=timestamp)
+
+    def drop_partitions(self):
+        for month in archived_months(refresh=True):
+            drop_partition(month)
+
+    def activity_ids(self, since=None):
+        return [activity.id for queryset in router.querysets(since=since) for activity in queryset]
+
+    def test_archive_read_across_partitions_and_drop(self):
+        ids = self.activity_ids()
+        # Months between the old one and the cutoff have no rows and get no table
+        self.assertEqual(months_to_archive(hot_months=2), [self.old])
+
+        self.assertEqual(archive_month(self.old), 2)
+        self.assertEqual(archived_months(), [self.old])
+        self.assertEqual(UserActivity.objects.count(), 1)
+        self.assertCountEqual(self.activity_ids(), ids)
+        self.assertEqual(len(self.activity_ids(since=self.current)), 1)
+
+        self.assertEqual(expired_partitions(retention_months=3), [self.old])
+        self.assertEqual(expired_partitions(retention_months=4), [])
+        drop_partition(self.old)
+        self.assertEqual(archived_months(), [])
+        self.assertEqual(len(self.activity_ids()), 1)
+
+    def test_deleting_a_user_deletes_archived_activity(self):
+        archive_month(self.old)
+        self.user.delete()
+        self.assertEqual(self.activity_ids(), [])
+
+
+class DashboardTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('dash', password='pw')
+        self.client.force_login(self.user)
+
+    @override_settings(BACKEND_API_RESILIENCE={'PAGE_DEADLINE': 0.3})
+    def test_slow_backend_call_does_not_hold_up_the_page(self):
+        async def slow_progress(user_id):
+            await asyncio.sleep(5)
+
+        catalog = {'results': [{'id': 7, 'title': 'Replicated course', 'slug': 'replicated-course'}]}
+        with mock.patch('core.views.async_api_client.get_user_progress', slow_progress), \
+                mock.patch('core.views.get_catalog_courses', return_value=catalog):
+            started = time.monotonic()
+            response = self.client.get('/dashboard/')
+        self.assertLess(time.monotonic() - started, 2)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['backend_unavailable'])
+        self.assertEqual(response.context['recent_courses'], catalog['results'])
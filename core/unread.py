@@ -0,0 +1,119 @@
+"""
+Per-user unread activity counter and activity version stamp.
+
+UserActivityStats is the source of truth. Its unread_count is adjusted with
+F() expressions as activities are recorded or marked read, and its version is
+bumped on every such change. Feed ETags read the version from that row by
+primary key, so they never go stale. The unread badge is served from a cached
+copy, which other processes may show for up to CACHE_TIMEOUT after a change.
+Neither ever queries UserActivity.
+"""
+import logging
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Value
+from django.db.models.functions import Greatest
+from django.dispatch import receiver
+
+from .models import UserActivity, UserActivityStats
+from .signals import activities_read, activities_recorded
+
+logger = logging.getLogger(__name__)
+
+CACHE_TIMEOUT = 30  # seconds
+
+
+def _cache_key(user_id):
+    return f'activity_stats:{user_id}'
+
+
+def _invalidate(user_id):
+    # After commit, so a concurrent read cannot cache the old row again
+    transaction.on_commit(lambda: cache.delete(_cache_key(user_id)))
+
+
+def get_activity_stats(user_id):
+    """
+    (unread_count, version) for a user, read from the stats row
+    """
+    stats = UserActivityStats.objects.filter(pk=user_id).values_list('unread_count', 'version').first()
+    if stats is None:
+        # First request for this user: seed the counter
+        recount_unread(user_id)
+        stats = UserActivityStats.objects.filter(pk=user_id).values_list('unread_count', 'version').first()
+    return tuple(stats)
+
+
+def get_unread_count(user_id):
+    count = cache.get(_cache_key(user_id))
+    if count is None:
+        count = get_activity_stats(user_id)[0]
+        cache.set(_cache_key(user_id), count, CACHE_TIMEOUT)
+    return count
+
+
+def get_activity_version(user_id):
+    """Changes whenever the user's activities are added to or change read state"""
+    return get_activity_stats(user_id)[1]
+
+
+def adjust_unread(user_id, delta):
+    """Add ``delta`` (may be zero or negative) to the unread counter and bump the version"""
+    updated = UserActivityStats.objects.filter(user_id=user_id).update(
+        unread_count=Greatest(F('unread_count') + delta, Value(0)),
+        version=F('version') + 1,
+    )
+    if not updated:
+        # No counter yet; count what is already committed instead
+        recount_unread(user_id)
+    _invalidate(user_id)
+
+
+def recount_unread(user_id):
+    """Recompute a user's counter from UserActivity and store it"""
+    count = UserActivity.objects.filter(user_id=user_id, is_read=False).count()
+    updated = UserActivityStats.objects.filter(user_id=user_id).update(unread_count=count, version=F('version') + 1)
+    if not updated:
+        UserActivityStats.objects.get_or_create(user_id=user_id, defaults={'unread_count': count, 'version': 1})
+    _invalidate(user_id)
+    return count
+
+
+def repair_unread_counts(user_ids=None):
+    """
+    Recount every counter (or only ``user_ids``) and fix drift.
+
+    Returns the ids of users whose stored counter was wrong.
+    """
+    actual = UserActivity.objects.filter(is_read=False)
+    stored = UserActivityStats.objects.all()
+    if user_ids is not None:
+        actual = actual.filter(user_id__in=user_ids)
+        stored = stored.filter(user_id__in=user_ids)
+
+    actual = {row['user_id']: row['total'] for row in actual.values('user_id').annotate(total=Count('id')).order_by()}
+    stored = dict(stored.values_list('user_id', 'unread_count'))
+
+    drifted = []
+    for user_id in set(actual) | set(stored):
+        if actual.get(user_id, 0) != stored.get(user_id):
+            drifted.append(user_id)
+            UserActivityStats.objects.update_or_create(
+                user_id=user_id, defaults={'unread_count': actual.get(user_id, 0)}
+            )
+            _invalidate(user_id)
+    return drifted
+
+
+@receiver(activities_recorded)
+def count_recorded(sender, activities, **kwargs):
+    unread = Counter(a.user_id for a in activities if not a.is_read)
+    for user_id in {a.user_id for a in activities}:
+        adjust_unread(user_id, unread[user_id])
+
+
+@receiver(activities_read)
+def count_read(sender, user_id, count, **kwargs):
+    adjust_unread(user_id, -count)
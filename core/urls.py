@@ -1,6 +1,10 @@
 from django.urls import path
 from . import views
-from .views_activity import mark_activity_read, mark_all_read, get_activities
+from .views_activity import (
+    mark_activity_read, mark_activities_read, mark_all_read, get_activities, unread_count, activity_stream,
+)
+from .views_metrics import backend_metrics
+from .views_webhooks import backend_webhook
 
 urlpatterns = [
     path('', views.home, name='home'),
@@ -13,6 +17,15 @@ urlpatterns = [
     
     # Activity API endpoints
     path('api/activities/mark-read/<int:activity_id>/', mark_activity_read, name='mark_activity_read'),
+    path('api/activities/mark-read/', mark_activities_read, name='mark_activities_read'),
     path('api/activities/mark-all-read/', mark_all_read, name='mark_all_read'),
+    path('api/activities/unread-count/', unread_count, name='activity_unread_count'),
+    path('api/activities/stream/', activity_stream, name='activity_stream'),
     path('api/activities/', get_activities, name='get_activities'),
+    
+    # Outbound backend API metrics (staff only)
+    path('api/backend-metrics/', backend_metrics, name='backend_metrics'),
+    
+    # Change notifications from the backend API (HMAC-signed)
+    path('api/backend-webhook/', backend_webhook, name='backend_webhook'),
 ]
\ No newline at end of file
@@ -2,50 +2,69 @@ from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login as auth_login
 from django.contrib import messages
+from asgiref.sync import sync_to_async
+from courses.catalog import get_catalog_courses
 from services.api_client import api_client
+from services.async_api_client import async_api_client, gather_with_deadline
+from services.resilience import is_unavailable
 import logging
 
 logger = logging.getLogger(__name__)
 
+BACKEND_UNAVAILABLE_MESSAGE = 'Course data is temporarily unavailable. Please try again shortly.'
+
 def home(request):
     """
-    Home page - display featured courses from backend API
+    Home page - display featured courses from the replicated catalog
     """
     # Get some featured courses to display on home page
-    courses_data = api_client.get_courses({'page_size': 6})  # Get first 6 courses
+    courses_data = get_catalog_courses(6)  # Get first 6 courses
     featured_courses = []
+    backend_unavailable = is_unavailable(courses_data)
     
     if courses_data and 'results' in courses_data:
         featured_courses = courses_data['results']
+    elif backend_unavailable:
+        messages.warning(request, BACKEND_UNAVAILABLE_MESSAGE)
     
     return render(request, 'core/home.html', {
-        'featured_courses': featured_courses
+        'featured_courses': featured_courses,
+        'backend_unavailable': backend_unavailable
     })
 
 @login_required
-def dashboard(request):
+async def dashboard(request):
     """
     User dashboard - display user progress from backend API
+
+    Progress comes from the backend API and recent courses from the
+    replicated catalog; both are fetched concurrently.
     """
+    user = await request.auser()
     user_progress = []
     recent_courses = []
     
-    # Try to get user progress from backend API
-    if request.user.is_authenticated:
-        # First authenticate with backend API using user credentials
-        # Note: In a real implementation, you'd want to handle this more securely
-        progress_data = api_client.get_user_progress()
-        if progress_data and 'results' in progress_data:
-            user_progress = progress_data['results']
+    # Note: In a real implementation, you'd want to authenticate with the
+    # backend API using the user's credentials more securely
+    progress_data, courses_data = await gather_with_deadline(
+        async_api_client.get_user_progress(user.id),
+        sync_to_async(get_catalog_courses)(5),
+    )
     
-    # Get recent courses
-    courses_data = api_client.get_courses({'page_size': 5})
+    if progress_data and 'results' in progress_data:
+        user_progress = progress_data['results']
     if courses_data and 'results' in courses_data:
         recent_courses = courses_data['results']
+    backend_unavailable = is_unavailable(progress_data) or is_unavailable(courses_data)
     
-    return render(request, 'core/dashboard.html', {
+    if backend_unavailable:
+        messages.warning(request, BACKEND_UNAVAILABLE_MESSAGE)
+    
+    # Templates and context processors may query the database
+    return await sync_to_async(render)(request, 'core/dashboard.html', {
         'user_progress': user_progress,
-        'recent_courses': recent_courses
+        'recent_courses': recent_courses,
+        'backend_unavailable': backend_unavailable
     })
 
 def about(request):
@@ -97,24 +116,24 @@ def contact(request):
 
 def search(request):
     """
-    Search functionality using backend API
+    Search the replicated catalog
     """
     query = request.GET.get('q', '')
     results = []
+    backend_unavailable = False
     
     if query:
-        # Search courses using backend API
-        search_params = {
-            'search': query,
-            'page_size': 20
-        }
-        courses_data = api_client.get_courses(search_params)
+        courses_data = get_catalog_courses(20, query)
         if courses_data and 'results' in courses_data:
             results = courses_data['results']
+        elif is_unavailable(courses_data):
+            backend_unavailable = True
+            messages.warning(request, BACKEND_UNAVAILABLE_MESSAGE)
     
     return render(request, 'core/search.html', {
         'query': query,
-        'results': results
+        'results': results,
+        'backend_unavailable': backend_unavailable
     })
 
 def api_login(request):
@@ -131,8 +150,8 @@ def api_login(request):
             if user is not None:
                 auth_login(request, user)
                 
-                # Then authenticate with backend API
-                if api_client.authenticate(username, password):
+                # Then authenticate with backend API; the tokens are kept for this user
+                if api_client.authenticate(username, password, user_id=user.pk):
                     messages.success(request, 'Successfully logged in and connected to backend API!')
                     return redirect('dashboard')
                 else:
@@ -146,29 +165,32 @@ def api_login(request):
     return render(request, 'registration/login.html')
 
 @login_required
-def recommendations(request):
+async def recommendations(request):
     """
     Display personalized course recommendations for the user
     """
-    # Get recommended courses (in a real app, this would be based on user's activity and preferences)
+    user = await request.auser()
+    
+    # Courses (in a real app, these would be filtered/ranked) come from the
+    # replicated catalog and the user's enrollments from the backend API;
+    # they are independent, so fetch them concurrently
+    courses_data, user_courses = await gather_with_deadline(
+        sync_to_async(get_catalog_courses)(12),
+        async_api_client.get_user_courses(user.id),
+    )
+    
     recommended_courses = []
-    try:
-        # Get all courses as recommendations (in a real app, this would be filtered/ranked)
-        courses_data = api_client.get_courses({'page_size': 12})
-        if courses_data and 'results' in courses_data:
-            recommended_courses = courses_data['results']
-    except Exception as e:
-        logger.error(f"Error fetching recommended courses: {str(e)}")
-        messages.error(request, 'Error loading recommendations. Please try again later.')
+    backend_unavailable = False
+    if courses_data and 'results' in courses_data:
+        recommended_courses = courses_data['results']
+    elif is_unavailable(courses_data):
+        backend_unavailable = True
+        messages.warning(request, BACKEND_UNAVAILABLE_MESSAGE)
     
     # Get user's enrolled courses to filter them out from recommendations
     enrolled_courses = []
-    try:
-        user_courses = api_client.get_user_courses(request.user.id)
-        if user_courses and 'results' in user_courses:
-            enrolled_courses = [course['id'] for course in user_courses['results']]
-    except Exception as e:
-        logger.error(f"Error fetching user's enrolled courses: {str(e)}")
+    if user_courses and 'results' in user_courses:
+        enrolled_courses = [course['id'] for course in user_courses['results']]
     
     # Filter out already enrolled courses
     filtered_recommendations = [
@@ -176,7 +198,8 @@ def recommendations(request):
         if course.get('id') not in enrolled_courses
     ]
     
-    return render(request, 'core/recommendations.html', {
+    return await sync_to_async(render)(request, 'core/recommendations.html', {
         'recommended_courses': filtered_recommendations,
-        'enrolled_courses': enrolled_courses
+        'enrolled_courses': enrolled_courses,
+        'backend_unavailable': backend_unavailable
     })
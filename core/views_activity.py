@@ -1,12 +1,20 @@
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_http_methods
 from django.db.models import Q
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
 from datetime import timedelta
 import json
 
+from .activity_feed import FEED_FIELDS, encode_feed, feed_rows
+from .activity_stream import event_stream, stream_enabled
 from .models import UserActivity
+from .partitions import router as partition_router
+from .signals import activities_read
+from .unread import get_activity_version, get_unread_count
 
 @login_required
 @require_http_methods(["POST"])
@@ -18,46 +26,170 @@ def mark_activity_read(request, activity_id):
     except UserActivity.DoesNotExist:
         return JsonResponse({'status': 'error', 'message': 'Activity not found'}, status=404)
 
+MAX_BULK_READ_IDS = 500
+
+def _mark_read(user_id, queryset):
+    """Mark the user's unread activities in ``queryset`` read with one UPDATE"""
+    updated = queryset.filter(user_id=user_id, is_read=False).update(is_read=True)
+    if updated:
+        activities_read.send(sender=UserActivity, user_id=user_id, count=updated)
+    return updated
+
 @login_required
 @require_http_methods(["POST"])
 def mark_all_read(request):
-    UserActivity.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    _mark_read(request.user.id, UserActivity.objects.all())
     return JsonResponse({'status': 'success'})
 
 @login_required
+@require_http_methods(["POST"])
+def mark_activities_read(request):
+    """
+    Mark a batch of activities read.
+
+    Accepts a JSON body with either ``ids`` (a list of activity ids) or
+    ``up_to`` (a feed cursor; that activity and everything older is marked).
+    """
+    try:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        payload = None
+    if not isinstance(payload, dict):
+        return JsonResponse({'status': 'error', 'message': 'Invalid JSON'}, status=400)
+    
+    if 'ids' in payload:
+        ids = payload['ids']
+        # bool is an int subclass, so JSON true/false would pass for 1/0
+        if not isinstance(ids, list) or not all(isinstance(i, int) and not isinstance(i, bool) for i in ids):
+            return JsonResponse({'status': 'error', 'message': 'ids must be a list of integers'}, status=400)
+        if len(ids) > MAX_BULK_READ_IDS:
+            return JsonResponse({'status': 'error', 'message': f'At most {MAX_BULK_READ_IDS} ids per request'}, status=400)
+        queryset = UserActivity.objects.filter(id__in=ids)
+    elif 'up_to' in payload:
+        try:
+            timestamp, activity_id = decode_cursor(payload['up_to'])
+        except ValueError:
+            return JsonResponse({'status': 'error', 'message': 'Invalid cursor'}, status=400)
+        queryset = UserActivity.objects.filter(
+            Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lte=activity_id)
+        )
+    else:
+        return JsonResponse({'status': 'error', 'message': 'Provide ids or up_to'}, status=400)
+    
+    updated = _mark_read(request.user.id, queryset)
+    return JsonResponse({'status': 'success', 'updated': updated})
+
+@login_required
+def unread_count(request):
+    # Served from the cached counter; never counts UserActivity rows
+    return JsonResponse({'unread_count': get_unread_count(request.user.id)})
+
+ACTIVITY_PAGE_SIZE = 50
+
+def encode_cursor(timestamp, activity_id):
+    """Opaque keyset cursor pointing just past the given activity"""
+    value = f"{timestamp.isoformat()}|{activity_id}"
+    return urlsafe_base64_encode(value.encode())
+
+def decode_cursor(cursor):
+    """Return (timestamp, id) from a cursor; raises ValueError if it is malformed"""
+    if not isinstance(cursor, str):
+        raise ValueError('Invalid cursor')
+    timestamp, activity_id = urlsafe_base64_decode(cursor).decode().split('|')
+    parsed = parse_datetime(timestamp)
+    if parsed is None:
+        raise ValueError('Invalid cursor')
+    return parsed, int(activity_id)
+
+def activities_etag(request):
+    # Built from the per-user version stamp (a primary-key lookup), so a matching
+    # If-None-Match is answered with 304 without touching UserActivity. The
+    # date is included because the ``days`` window slides.
+    if not request.user.is_authenticated:
+        return None
+    version = get_activity_version(request.user.id)
+    return f"{request.user.id}.{version}.{timezone.now():%Y%m%d}"
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=activities_etag)
 def get_activities(request):
     # Get filter parameters
     filter_type = request.GET.get('type', 'all')
     days = int(request.GET.get('days', 7))
     
-    # Base queryset
-    activities = UserActivity.objects.filter(user=request.user)
-    
-    # Apply date filter
-    if days > 0:
-        date_threshold = timezone.now() - timedelta(days=days)
-        activities = activities.filter(timestamp__gte=date_threshold)
+    # Keyset pagination on (timestamp, id): each page seeks straight to the
+    # cursor through the (user, timestamp, id) index instead of using OFFSET
+    cursor = request.GET.get('cursor')
+    before = None
+    if cursor:
+        try:
+            before = decode_cursor(cursor)
+        except ValueError:
+            return JsonResponse({'status': 'error', 'message': 'Invalid cursor'}, status=400)
     
-    # Apply type filter
-    if filter_type != 'all':
-        activities = activities.filter(activity_type=filter_type)
+    # Only the partitions covering the date window are queried
+    date_threshold = timezone.now() - timedelta(days=days) if days > 0 else None
+    until = before[0] + timedelta(microseconds=1) if before else None
     
-    # Order and limit
-    activities = activities.order_by('-timestamp')[:50]
+    # Fetch one extra row to know whether another page exists
+    limit = ACTIVITY_PAGE_SIZE + 1
+    rows = []
+    for queryset in partition_router.querysets(since=date_threshold, until=until):
+        queryset = queryset.filter(user_id=request.user.id)
+        
+        # Apply date filter
+        if date_threshold is not None:
+            queryset = queryset.filter(timestamp__gte=date_threshold)
+        
+        # Apply type filter
+        if filter_type != 'all':
+            queryset = queryset.filter(activity_type=filter_type)
+        
+        # Resume after the cursor
+        if before is not None:
+            queryset = queryset.filter(
+                Q(timestamp__lt=before[0]) | Q(timestamp=before[0], id__lt=before[1])
+            )
+        
+        # Order and limit; rows are plain tuples, no model instances
+        queryset = queryset.order_by('-timestamp', '-id')[:limit - len(rows)]
+        rows.extend(feed_rows(queryset))
+        if len(rows) >= limit:
+            break
     
-    # Prepare response data
-    data = [{
-        'id': activity.id,
-        'type': activity.activity_type,
-        'title': activity.page_title,
-        'timestamp': activity.timestamp.isoformat(),
-        'is_read': activity.is_read,
-        'is_important': activity.is_important,
-        'progress': activity.progress,
-        'metadata': activity.metadata,
-        'priority': activity.priority,
-        'priority_class': activity.priority_class,
-        'icon': activity.icon,
-    } for activity in activities]
+    has_more = len(rows) > ACTIVITY_PAGE_SIZE
+    rows = rows[:ACTIVITY_PAGE_SIZE]
     
-    return JsonResponse({'activities': data})
+    last = dict(zip(FEED_FIELDS, rows[-1])) if rows else None
+    content = encode_feed(
+        rows,
+        has_more=has_more,
+        next=encode_cursor(last['timestamp'], last['id']) if has_more else None,
+    )
+    return HttpResponse(content, content_type='application/json')
+
+@login_required
+async def activity_stream(request):
+    """
+    Long-lived SSE connection pushing the user's new activities.
+
+    Resumes after the ``Last-Event-ID`` header (or ``last_event_id`` query
+    parameter) by replaying newer activities from the database. Answers
+    204, which stops EventSource from reconnecting, while streams are
+    disabled (see core.activity_stream).
+    """
+    if not stream_enabled():
+        return HttpResponse(status=204)
+    user = await request.auser()
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    response = StreamingHttpResponse(event_stream(user.id, last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
\ No newline at end of file
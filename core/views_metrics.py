@@ -0,0 +1,17 @@
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import JsonResponse
+
+from services.api_client import api_client
+from services.metrics import collect_metrics
+
+
+@staff_member_required
+def backend_metrics(request):
+    """
+    Outbound backend API metrics (staff only): per-endpoint latency
+    histograms and percentiles, status codes, bytes and retries, cache and
+    token counters, and connection pool usage
+    """
+    data = collect_metrics()
+    data['pools'] = api_client.pool_stats()
+    return JsonResponse(data)
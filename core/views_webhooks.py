@@ -0,0 +1,41 @@
+import json
+import logging
+
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+
+from services.api_client import api_client
+from services.invalidation import (
+    SIGNATURE_HEADER, TIMESTAMP_HEADER, get_webhook_settings, parse_entities, purge_entities, verify_signature,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@csrf_exempt
+@require_POST
+def backend_webhook(request):
+    """
+    Backend change notifications: purge the cached responses and refresh
+    the replicated data for the entities listed (see services.invalidation)
+    """
+    options = get_webhook_settings()
+    if not verify_signature(
+        request.body,
+        request.headers.get(TIMESTAMP_HEADER),
+        request.headers.get(SIGNATURE_HEADER),
+        options['SECRET'],
+        options['TOLERANCE'],
+    ):
+        logger.warning("Rejected backend webhook with a missing or invalid signature")
+        return JsonResponse({'error': 'Invalid signature'}, status=401)
+
+    try:
+        entities = parse_entities(json.loads(request.body), options['MAX_ENTITIES'])
+    except ValueError as e:
+        # json.JSONDecodeError is a ValueError too
+        return JsonResponse({'error': str(e)}, status=400)
+
+    tags = purge_entities(entities, api_client.response_cache)
+    return JsonResponse({'entities': len(entities), 'purged_tags': tags})
@@ -14,7 +14,8 @@ class ModuleInline(admin.StackedInline):
 
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
-    list_display = ('title', 'slug', 'created_at', 'updated_at')
+    list_display = ('title', 'slug', 'remote_id', 'is_deleted', 'created_at', 'updated_at')
+    list_filter = ('is_deleted',)
     prepopulated_fields = {'slug': ('title',)}
     inlines = [ModuleInline]
 
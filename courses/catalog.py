@@ -0,0 +1,55 @@
+"""
+Read side of the replicated backend catalog (see courses.sync).
+
+Views get backend-shaped course dicts from the local database, or None
+while nothing has been replicated yet so they can fall back to the
+backend API.
+"""
+from django.db.models import Q
+
+from services.api_client import api_client
+
+from .models import Course
+
+
+def replica_courses():
+    """Live (not tombstoned) courses replicated from the backend"""
+    return Course.objects.filter(remote_id__isnull=False, is_deleted=False)
+
+
+def _items(queryset, limit):
+    return [course.as_catalog_item() for course in queryset.order_by('-remote_updated_at', '-id')[:limit]]
+
+
+def latest_courses(limit):
+    """The most recently updated courses, or None if the replica is empty"""
+    items = _items(replica_courses(), limit)
+    if not items and not Course.objects.filter(remote_id__isnull=False).exists():
+        return None
+    return items
+
+
+def search_courses(query, limit):
+    """Courses whose title or description match ``query``, or None if the replica is empty"""
+    queryset = replica_courses().filter(Q(title__icontains=query) | Q(description__icontains=query))
+    items = _items(queryset, limit)
+    if not items and not Course.objects.filter(remote_id__isnull=False).exists():
+        return None
+    return items
+
+
+def get_catalog_courses(limit, query=None):
+    """
+    Courses for catalog pages, shaped like a get_courses() response.
+
+    Served from the replica; the backend API is only called while nothing
+    has been replicated yet.
+    """
+    items = search_courses(query, limit) if query else latest_courses(limit)
+    if items is not None:
+        return {'results': items}
+
+    params = {'page_size': limit}
+    if query:
+        params['search'] = query
+    return api_client.get_courses(params)
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+
+from courses.sync import get_watermark, sync_catalog
+from services.resilience import BackendUnavailableError
+
+
+class Command(BaseCommand):
+    help = 'Pull courses changed since the last sync from the backend API into the local catalog'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help='Walk the whole catalog and tombstone courses the backend no longer lists')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--interval', type=int, default=0,
+                            help='Keep running, syncing every this many seconds')
+
+    def handle(self, *args, **options):
+        while True:
+            self._sync(options['full'], options['batch_size'], fatal=not options['interval'])
+            if not options['interval']:
+                return
+            # Only the first pass of a periodic run is full
+            options['full'] = False
+            close_old_connections()
+            time.sleep(options['interval'])
+
+    def _sync(self, full, batch_size, fatal):
+        self.stdout.write(f'Syncing catalog ({"full" if full else f"changes since {get_watermark()}"})')
+        try:
+            stats = sync_catalog(full=full, batch_size=batch_size)
+        except BackendUnavailableError as e:
+            if fatal:
+                raise CommandError(f'Backend unavailable: {e}')
+            self.stderr.write(f'Backend unavailable, will retry: {e}')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['upserted']} courses upserted ({stats['deleted']} deleted on the backend), "
+            f"{stats['tombstoned']} missing courses tombstoned"
+        ))
@@ -0,0 +1,38 @@
+# Generated by Django 5.1 on 2026-10-18 06:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("courses", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="course",
+            name="deleted_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="course",
+            name="is_deleted",
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+        migrations.AddField(
+            model_name="course",
+            name="remote_data",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name="course",
+            name="remote_id",
+            field=models.PositiveBigIntegerField(blank=True, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name="course",
+            name="remote_updated_at",
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
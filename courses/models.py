@@ -8,6 +8,25 @@ class Course(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Replica of the backend API catalog (see courses.sync); courses created
+    # here have no remote_id
+    remote_id = models.PositiveBigIntegerField(null=True, blank=True, unique=True)
+    remote_updated_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    remote_data = models.JSONField(default=dict, blank=True)
+    # Tombstone for courses deleted on the backend
+    is_deleted = models.BooleanField(default=False, db_index=True)
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    def as_catalog_item(self):
+        """The course as the backend API returns it, for templates written against it"""
+        return {
+            **self.remote_data,
+            'id': self.remote_id if self.remote_id is not None else self.id,
+            'title': self.title,
+            'slug': self.slug,
+            'description': self.description,
+        }
+
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
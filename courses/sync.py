@@ -0,0 +1,212 @@
+"""
+Delta sync of the backend API course catalog into Course.
+
+Each run asks the backend for courses updated since the newest
+remote_updated_at already replicated (the watermark) and upserts them in
+bulk by remote_id. Courses the backend reports as deleted are kept as
+tombstones (is_deleted) rather than removed. A full sync walks the whole
+catalog and also tombstones replicated courses the backend no longer lists.
+
+Courses named in a backend change webhook (see services.invalidation) are
+refreshed right away instead of waiting for the next sync.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections, transaction
+from django.db.models import Max
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.utils.text import slugify
+
+from services.api_client import NOT_FOUND, api_client
+from services.invalidation import backend_entities_changed
+
+from .models import Course
+
+logger = logging.getLogger(__name__)
+
+SLUG_MAX_LENGTH = Course._meta.get_field('slug').max_length
+
+UPSERT_FIELDS = [
+    'title', 'slug', 'description', 'remote_updated_at', 'remote_data', 'is_deleted', 'deleted_at', 'updated_at',
+]
+
+# Webhook-triggered refreshes run here, off the webhook request
+_refresh_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='catalog-refresh')
+
+
+def get_watermark():
+    """remote_updated_at of the most recently changed replicated course"""
+    return Course.objects.filter(remote_id__isnull=False).aggregate(latest=Max('remote_updated_at'))['latest']
+
+
+def _is_deleted(record):
+    return bool(record.get('is_deleted') or record.get('deleted_at'))
+
+
+def _slug_for(record):
+    slug = record.get('slug') or slugify(record.get('title') or '') or f"course-{record['id']}"
+    return slug[:SLUG_MAX_LENGTH]
+
+
+def upsert_courses(records):
+    """Insert or update a batch of backend course records with one query"""
+    records = {record['id']: record for record in records}
+    if not records:
+        return 0
+
+    # Replicated courses keep their slug so their URLs stay stable
+    slugs = dict(Course.objects.filter(remote_id__in=records).values_list('remote_id', 'slug'))
+    for remote_id, record in records.items():
+        slugs.setdefault(remote_id, _slug_for(record))
+    taken = set(
+        Course.objects.filter(slug__in=slugs.values()).exclude(remote_id__in=records).values_list('slug', flat=True)
+    )
+
+    now = timezone.now()
+    courses = []
+    used = set()
+    for remote_id, record in records.items():
+        slug = slugs[remote_id]
+        if slug in taken or slug in used:
+            suffix = f'-{remote_id}'
+            slug = slug[:SLUG_MAX_LENGTH - len(suffix)] + suffix
+        used.add(slug)
+        deleted = _is_deleted(record)
+        courses.append(Course(
+            remote_id=remote_id,
+            title=(record.get('title') or f'Course {remote_id}')[:200],
+            slug=slug,
+            description=record.get('description') or '',
+            remote_updated_at=parse_datetime(record['updated_at']) if record.get('updated_at') else None,
+            remote_data=record,
+            is_deleted=deleted,
+            deleted_at=now if deleted else None,
+        ))
+
+    Course.objects.bulk_create(
+        courses, update_conflicts=True, unique_fields=['remote_id'], update_fields=UPSERT_FIELDS,
+    )
+    return len(courses)
+
+
+def tombstone_missing(seen_remote_ids):
+    """Mark replicated courses the backend no longer lists as deleted"""
+    return Course.objects.filter(remote_id__isnull=False, is_deleted=False).exclude(
+        remote_id__in=seen_remote_ids
+    ).update(is_deleted=True, deleted_at=timezone.now(), updated_at=timezone.now())
+
+
+def sync_catalog(full=False, batch_size=500, client=None):
+    """
+    Pull changed courses from the backend into the local replica.
+
+    Returns a dict of counts. Raises BackendUnavailableError if the backend
+    fails part way (any page that is not a 2xx); batches already written
+    are kept and the next run resumes from the watermark. A full sync only
+    tombstones courses once the walk has reached the end of the catalog,
+    so a failed or cut-short walk never deletes anything.
+    """
+    client = client or api_client
+    watermark = None if full else get_watermark()
+    params = {'ordering': 'updated_at', 'include_deleted': 'true'}
+    if watermark is not None:
+        # Inclusive, so courses sharing the watermark's timestamp are not
+        # skipped; upserting them again is harmless
+        params['updated_since'] = watermark.isoformat()
+
+    stats = {'upserted': 0, 'deleted': 0, 'tombstoned': 0}
+    seen = set()
+    batch = []
+
+    def write(batch):
+        with transaction.atomic():
+            stats['upserted'] += upsert_courses(batch)
+        stats['deleted'] += sum(1 for record in batch if _is_deleted(record))
+
+    for record in client.iter_courses(params, page_size=batch_size):
+        if not isinstance(record, dict) or record.get('id') is None:
+            continue
+        seen.add(record['id'])
+        batch.append(record)
+        if len(batch) >= batch_size:
+            write(batch)
+            batch = []
+    if batch:
+        write(batch)
+
+    # Reached only when iter_courses() read every page (it raises otherwise)
+    if full:
+        stats['tombstoned'] = tombstone_missing(seen)
+    logger.info("Catalog sync (%s since %s): %s", 'full' if full else 'delta', watermark, stats)
+    return stats
+
+
+def refresh_courses(remote_ids, client=None):
+    """
+    Re-fetch replicated courses and upsert them, tombstoning those the
+    backend answers 404 for. Courses it fails to return for any other
+    reason are left alone for the next sync. Returns a dict of counts.
+    """
+    client = client or api_client
+    remote_ids = list(
+        Course.objects.filter(remote_id__in=remote_ids).values_list('remote_id', flat=True)
+    )
+    stats = {'upserted': 0, 'tombstoned': 0, 'failed': 0}
+    if not remote_ids:
+        return stats
+
+    futures = {remote_id: client.bulk_executor.submit(client.fetch_course_detail, remote_id)
+               for remote_id in remote_ids}
+    records, missing = [], []
+    for remote_id, future in futures.items():
+        try:
+            detail = future.result()
+        except Exception as e:
+            logger.error(f"Refreshing course {remote_id} failed: {e}")
+            detail = None
+        if detail is NOT_FOUND:
+            missing.append(remote_id)
+        elif isinstance(detail, dict) and detail.get('id') is not None:
+            records.append(detail)
+        else:
+            stats['failed'] += 1
+            logger.warning(f"Could not refresh course {remote_id}; leaving it for the next sync")
+
+    with transaction.atomic():
+        stats['upserted'] = upsert_courses(records)
+        if missing:
+            stats['tombstoned'] = Course.objects.filter(remote_id__in=missing, is_deleted=False).update(
+                is_deleted=True, deleted_at=timezone.now(), updated_at=timezone.now()
+            )
+    return stats
+
+
+def _refresh_in_background(remote_ids):
+    try:
+        stats = refresh_courses(remote_ids)
+        logger.info("Refreshed replicated courses from webhook: %s", stats)
+    except Exception:
+        logger.exception("Refreshing replicated courses from webhook failed")
+    finally:
+        close_old_connections()
+
+
+@receiver(backend_entities_changed)
+def refresh_changed_courses(sender, entities, **kwargs):
+    """
+    Keep replicated courses in step with backend change webhooks. The
+    refresh runs in the background so the webhook is answered at once,
+    however slow the backend is.
+    """
+    remote_ids = []
+    for entity in entities:
+        if entity['type'] == 'course':
+            try:
+                remote_ids.append(int(entity['id']))
+            except (TypeError, ValueError):
+                continue
+    if remote_ids:
+        _refresh_executor.submit(_refresh_in_background, remote_ids)
@@ -1,3 +1,70 @@
+from unittest import mock
+
 from django.test import TestCase
 
-# Create your tests here.
+from services.fake_backend import FakeBackend
+from services.invalidation import backend_entities_changed
+from services.resilience import BackendUnavailableError
+from services.tests import make_client
+
+from . import sync
+from .models import Course
+from .sync import refresh_courses, sync_catalog, upsert_courses
+
+
+class SyncCatalogTests(TestCase):
+    def setUp(self):
+        self.backend = FakeBackend(port=0, latency=0, courses=250, max_page_size=50).start()
+        self.addCleanup(self.backend.stop)
+        self.client = make_client(self.backend)
+
+    def test_full_sync_reads_every_page_before_tombstoning(self):
+        upsert_courses([self.backend.course(i) for i in range(1, 31)] + [{'id': 999, 'title': 'Gone'}])
+
+        stats = sync_catalog(full=True, batch_size=100, client=self.client)
+
+        self.assertEqual(stats['upserted'], 250)
+        self.assertEqual(stats['tombstoned'], 1)
+        self.assertEqual(Course.objects.filter(remote_id__isnull=False, is_deleted=False).count(), 250)
+        self.assertTrue(Course.objects.get(remote_id=999).is_deleted)
+
+    def test_failed_listing_aborts_without_tombstoning(self):
+        upsert_courses([self.backend.course(i) for i in range(1, 31)])
+        self.backend.forced_statuses['/api/courses/'] = 429
+
+        with self.assertRaises(BackendUnavailableError):
+            sync_catalog(full=True, batch_size=100, client=self.client)
+
+        self.assertEqual(Course.objects.filter(is_deleted=True).count(), 0)
+
+
+class RefreshCoursesTests(TestCase):
+    def setUp(self):
+        self.backend = FakeBackend(port=0, latency=0, courses=5).start()
+        self.addCleanup(self.backend.stop)
+        self.client = make_client(self.backend)
+        upsert_courses([{**self.backend.course(i), 'title': 'Old'} for i in (1, 2)] + [{'id': 99, 'title': 'Gone'}])
+
+    def test_updates_changed_and_tombstones_only_404s(self):
+        stats = refresh_courses([1, 2, 99], client=self.client)
+
+        self.assertEqual(stats, {'upserted': 2, 'tombstoned': 1, 'failed': 0})
+        self.assertEqual(Course.objects.get(remote_id=1).title, 'Course 1')
+        self.assertTrue(Course.objects.get(remote_id=99).is_deleted)
+
+    def test_client_errors_leave_courses_alone(self):
+        self.backend.forced_statuses['/api/courses/1/'] = 403
+        self.backend.forced_statuses['/api/courses/2/'] = 429
+
+        stats = refresh_courses([1, 2], client=self.client)
+
+        self.assertEqual(stats, {'upserted': 0, 'tombstoned': 0, 'failed': 2})
+        self.assertFalse(Course.objects.filter(is_deleted=True).exclude(remote_id=99).exists())
+        self.assertEqual(Course.objects.get(remote_id=1).title, 'Old')
+
+    def test_webhook_refresh_runs_in_background(self):
+        with mock.patch.object(sync._refresh_executor, 'submit') as submit:
+            backend_entities_changed.send(sender=None, entities=[
+                {'type': 'course', 'id': 1}, {'type': 'lesson', 'id': 5}, {'type': 'course', 'id': '2'},
+            ])
+        submit.assert_called_once_with(sync._refresh_in_background, [1, 2])
@@ -6,12 +6,12 @@ from .serializers import CourseSerializer, ModuleSerializer, ContentSerializer
 
 def courses_list(request):
     """View function to display all courses in a card-based layout."""
-    courses = Course.objects.all().order_by('-created_at')
+    courses = Course.objects.filter(is_deleted=False).order_by('-created_at')
     return render(request, 'courses/courses_list.html', {'courses': courses})
 
 def course_detail(request, slug):
     """View function to display a single course with its modules and content."""
-    course = get_object_or_404(Course, slug=slug)
+    course = get_object_or_404(Course, slug=slug, is_deleted=False)
     modules = course.modules.all().order_by('order')
     return render(request, 'courses/course_detail.html', {
         'course': course,
@@ -36,11 +36,11 @@ def module_detail(request, course_slug, module_id):
     })
 
 class CourseListCreateView(generics.ListCreateAPIView):
-    queryset = Course.objects.all()
+    queryset = Course.objects.filter(is_deleted=False)
     serializer_class = CourseSerializer
 
 class CourseDetailView(generics.RetrieveUpdateDestroyAPIView):
-    queryset = Course.objects.all()
+    queryset = Course.objects.filter(is_deleted=False)
     serializer_class = CourseSerializer
     lookup_field = 'slug'
 
@@ -1,11 +1,43 @@
 import requests
 import json
 from django.conf import settings
-from django.core.cache import cache
 import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from .resilience import (
+    BackendUnavailable, BackendUnavailableError, CircuitBreaker, RetryBudget, backoff_delay, get_resilience_settings,
+    is_unavailable, timeout_for,
+)
+from .metrics import metrics
+from .progress_queue import REJECTED, RETRY, SENT, ProgressQueue
+from .response_cache import NOT_MODIFIED, ResponseCache
+from .streaming import iter_json_items
+from .token_store import TokenStore
+from .transport import PooledTransport
 
 logger = logging.getLogger(__name__)
 
+# Gateway errors are usually transient; other 5xx are not retried
+RETRYABLE_STATUS_CODES = {502, 503, 504}
+
+# Per-course data get_course_details_many() can fetch, and the method for each
+COURSE_PARTS = {
+    'detail': 'get_course_detail',
+    'lessons': 'get_course_lessons',
+    'quizzes': 'get_course_quizzes',
+}
+
+# End-of-stream marker for paginated iterators
+_PAGES_DONE = object()
+
+# Returned by lookups that tell a resource the backend does not have (404)
+# apart from other client errors
+NOT_FOUND = object()
+
 class BackendAPIClient:
     """
     Client for communicating with the backend API server
@@ -13,105 +45,269 @@ class BackendAPIClient:
     
     def __init__(self):
         self.base_url = getattr(settings, 'BACKEND_API_URL', 'http://127.0.0.1:8000')
-        self.session = requests.Session()
-        self.session.headers.update({
-            'Content-Type': 'application/json',
-        })
+        # Shared by every thread; never mutated after construction
+        self.transport = PooledTransport.from_settings()
+        self.response_cache = ResponseCache.from_settings()
+        if self.response_cache:
+            # Serve the last good responses from before a restart right away
+            self.response_cache.warm()
+        self.tokens = TokenStore.from_settings(self._request_token_refresh)
+        
+        # Timeouts, retries and circuit breaking for this backend
+        options = get_resilience_settings()
+        self.timeouts = options['TIMEOUTS']
+        self.max_retries = options['MAX_RETRIES']
+        self.backoff_base = options['BACKOFF_BASE']
+        self.backoff_cap = options['BACKOFF_CAP']
+        self.retry_budget = RetryBudget(
+            ratio=options['RETRY_BUDGET_RATIO'],
+            min_per_second=options['RETRY_BUDGET_MIN_PER_SECOND'],
+        )
+        self.circuit_breaker = CircuitBreaker(
+            window=options['BREAKER_WINDOW'],
+            min_requests=options['BREAKER_MIN_REQUESTS'],
+            error_rate=options['BREAKER_ERROR_RATE'],
+            reset_timeout=options['BREAKER_RESET_TIMEOUT'],
+        )
+        
+        # Bounded fan-out for bulk fetches; keep it at or below the pool size
+        self.bulk_executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'BACKEND_API_BULK_WORKERS', 8),
+            thread_name_prefix='backend-api-bulk',
+        )
+        
+        # Progress updates are written behind; resume any left unsent by
+        # an earlier run
+        self.progress_queue = ProgressQueue.from_settings(self._send_progress, executor=self.bulk_executor)
+        if self.progress_queue:
+            self.progress_queue.start_if_pending()
     
-    def _make_request(self, method, endpoint, data=None, params=None, auth_required=False):
+    def _make_request(self, method, endpoint, data=None, params=None, auth_required=False, use_cache=True,
+                      user_id=None):
         """
-        Make HTTP request to backend API
+        Make HTTP request to backend API, authenticated as ``user_id`` (a
+        Django user id; None for the service-wide credentials) if required
         """
         # Ensure endpoint starts with /api/ if not already present
         if not endpoint.startswith('/api/'):
             endpoint = f"/api/{endpoint.lstrip('/')}"
-        url = f"{self.base_url.rstrip('/')}{endpoint}"
         
-        try:
-            if auth_required:
-                # Get token from session or cache if needed
-                token = self._get_auth_token()
-                if token:
-                    self.session.headers.update({
-                        'Authorization': f'Bearer {token}'
-                    })
-            
-            response = self.session.request(
-                method=method,
-                url=url,
-                json=data if data else None,
-                params=params
+        # Public GETs do not depend on who is asking, so their cached
+        # responses are shared by every user (including anonymous ones)
+        if method == 'GET' and not auth_required and use_cache and self.response_cache:
+            key = self.response_cache.make_key(method, endpoint, params)
+            return self.response_cache.get_or_fetch(
+                key, endpoint, lambda validators: self._fetch_for_cache(method, endpoint, params, validators)
             )
+        
+        return self._send(method, endpoint, data, params, auth_required, user_id)
+    
+    def _fetch_for_cache(self, method, endpoint, params, validators):
+        """
+        Fetch a public response for the response cache, as a conditional
+        request when ``validators`` (from the cached entry) are given.
+
+        Returns (body, validators); the body is NOT_MODIFIED when the backend
+        answered 304, so the cached copy is reused without downloading or
+        parsing it again.
+        """
+        headers = {}
+        if validators and validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators and validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+        
+        response = self._send(method, endpoint, params=params, stream=True, headers=headers)
+        if response is None or is_unavailable(response):
+            return response, None
+        
+        with response:
+            if response.status_code == 304:
+                metrics.increment('cache_revalidated')
+                return NOT_MODIFIED, validators
+            try:
+                body = response.json() if response.content else {}
+            except ValueError as e:
+                logger.error(f"API request failed: {e}")
+                return None, None
+        return body, {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+    
+    def _send(self, method, endpoint, data=None, params=None, auth_required=False, user_id=None, stream=False,
+              headers=None, client_errors=False):
+        """
+        Send a request to the backend, bypassing the response cache.
+
+        Returns the parsed body (the unread response if ``stream``), None for
+        client errors (4xx), or a BackendUnavailable when the backend could
+        not answer. ``headers`` are added to the request. With
+        ``client_errors`` and ``stream``, 4xx responses are returned too so
+        the caller can tell them apart.
+        """
+        url = f"{self.base_url.rstrip('/')}{endpoint}"
+        timeout = timeout_for(endpoint, self.timeouts)
+        # Only idempotent requests are retried
+        retries = self.max_retries if method in ('GET', 'HEAD', 'OPTIONS') else 0
+        
+        self.retry_budget.record_request()
+        attempt = 0
+        while True:
+            if not self.circuit_breaker.allow_request():
+                metrics.increment('circuit_open_rejections')
+                return BackendUnavailable('circuit open', endpoint)
             
-            if response.status_code == 401 and auth_required:
-                # Token might be expired, try to refresh
-                if self._refresh_token():
-                    # Retry the request with new token
-                    token = self._get_auth_token()
-                    self.session.headers.update({
-                        'Authorization': f'Bearer {token}'
-                    })
-                    response = self.session.request(
-                        method=method,
-                        url=url,
-                        json=data if data else None,
-                        params=params
-                    )
+            try:
+                response = self._request(method, url, data, params, auth_required, timeout, user_id, stream, headers)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                failure = BackendUnavailable(str(e), endpoint)
+            except requests.exceptions.RequestException as e:
+                # Not worth retrying, but still a failed call; left
+                # unrecorded, a half-open probe would keep the circuit shut
+                self.circuit_breaker.record_failure()
+                logger.error(f"API request failed: {e}")
+                return None
+            except BaseException:
+                self.circuit_breaker.release_probe()
+                raise
+            else:
+                if response.status_code < 500:
+                    self.circuit_breaker.record_success()
+                    if client_errors and stream and response.status_code >= 400:
+                        return response
+                    try:
+                        response.raise_for_status()
+                        if stream:
+                            return response
+                        return response.json() if response.content else {}
+                    except (requests.exceptions.RequestException, ValueError) as e:
+                        response.close()
+                        logger.error(f"API request failed: {e}")
+                        return None
+                response.close()
+                failure = BackendUnavailable(f"HTTP {response.status_code}", endpoint, response.status_code)
             
-            response.raise_for_status()
-            return response.json() if response.content else {}
+            self.circuit_breaker.record_failure()
+            retryable = failure.status_code is None or failure.status_code in RETRYABLE_STATUS_CODES
+            if not retryable or attempt >= retries or not self.retry_budget.try_spend():
+                logger.error(f"API request failed: {failure.reason}")
+                return failure
             
-        except requests.exceptions.RequestException as e:
-            logger.error(f"API request failed: {e}")
-            return None
-    
-    def _get_auth_token(self):
-        """Get authentication token from cache"""
-        return cache.get('backend_api_access_token')
+            metrics.record_retry(method, endpoint)
+            time.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_cap))
+            attempt += 1
     
-    def _set_auth_token(self, access_token, refresh_token=None):
-        """Store authentication tokens in cache"""
-        cache.set('backend_api_access_token', access_token, timeout=3600)  # 1 hour
-        if refresh_token:
-            cache.set('backend_api_refresh_token', refresh_token, timeout=86400)  # 24 hours
+    def _request(self, method, url, data, params, auth_required, timeout, user_id=None, stream=False, headers=None):
+        """Single HTTP exchange, refreshing the token once on a 401"""
+        # The Authorization header goes with this request only; the shared
+        # sessions are used concurrently and must not carry credentials
+        token = self._get_auth_token(user_id) if auth_required else None
+        
+        response = self._exchange(
+            method,
+            url,
+            headers=self._headers(token, headers),
+            json=data if data else None,
+            params=params,
+            timeout=timeout,
+            stream=stream
+        )
+        
+        if response.status_code == 401 and auth_required:
+            response.close()
+            # Token was revoked or expired early; refresh it once (shared
+            # with any other request that got a 401 for the same user)
+            token = self._refresh_token(user_id, rejected=token)
+            if token:
+                # Retry the request with new token
+                response = self._exchange(
+                    method,
+                    url,
+                    headers=self._headers(token, headers),
+                    json=data if data else None,
+                    params=params,
+                    timeout=timeout,
+                    stream=stream
+                )
+        
+        return response
     
-    def _refresh_token(self):
-        """Refresh the access token"""
-        refresh_token = cache.get('backend_api_refresh_token')
-        if not refresh_token:
-            return False
+    def _exchange(self, method, url, **kwargs):
+        """One HTTP exchange through the connection pool, recorded in the metrics"""
+        path = urlsplit(url).path
+        start = time.perf_counter()
+        try:
+            response = self.transport.request(method, url, **kwargs)
+        except requests.exceptions.RequestException:
+            metrics.record_request(method, path, None, time.perf_counter() - start)
+            raise
         
+        if kwargs.get('stream'):
+            # The body has not been read yet
+            received = int(response.headers.get('Content-Length') or 0)
+        else:
+            received = len(response.content)
+        metrics.record_request(
+            method, path, response.status_code, time.perf_counter() - start,
+            bytes_sent=len(response.request.body or b''), bytes_received=received,
+        )
+        return response
+    
+    def _headers(self, token, extra=None):
+        """Headers for one request: ``extra`` plus the Authorization header"""
+        headers = dict(extra or {})
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        return headers or None
+    
+    def _get_auth_token(self, user_id=None):
+        """Get a valid access token, refreshing it ahead of expiry"""
+        return self.tokens.get_access_token(user_id)
+    
+    def _set_auth_token(self, access_token, refresh_token=None, user_id=None):
+        """Store authentication tokens with their expiry"""
+        self.tokens.save(user_id, access_token, refresh_token)
+    
+    def _refresh_token(self, user_id=None, rejected=None):
+        """Refresh the access token; returns the new token or None"""
+        return self.tokens.refresh(user_id, rejected)
+    
+    def _request_token_refresh(self, refresh_token):
+        """Exchange a refresh token for new tokens"""
+        metrics.increment('token_refreshes')
         try:
-            response = self.session.post(
+            response = self._exchange(
+                'POST',
                 f"{self.base_url}/api/token/refresh/",
-                json={'refresh': refresh_token}
+                json={'refresh': refresh_token},
+                timeout=timeout_for('/api/token/refresh/', self.timeouts)
             )
             response.raise_for_status()
+            return response.json()
             
-            tokens = response.json()
-            self._set_auth_token(tokens['access'])
-            return True
-            
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, ValueError) as e:
             logger.error(f"Token refresh failed: {e}")
-            return False
+            return None
     
-    def authenticate(self, username, password):
+    def authenticate(self, username, password, user_id=None):
         """
-        Authenticate with backend API and store tokens
+        Authenticate with backend API and store tokens for ``user_id``
         """
         try:
-            response = self.session.post(
+            response = self._exchange(
+                'POST',
                 f"{self.base_url}/api/token/",
                 json={
                     'username': username,
                     'password': password
-                }
+                },
+                timeout=timeout_for('/api/token/', self.timeouts)
             )
             response.raise_for_status()
             
             tokens = response.json()
-            self._set_auth_token(tokens['access'], tokens['refresh'])
+            self._set_auth_token(tokens['access'], tokens['refresh'], user_id)
             return True
             
         except requests.exceptions.RequestException as e:
@@ -122,18 +318,138 @@ class BackendAPIClient:
         """
         Get list of courses from backend API with related blogs and subtopics
         """
-        if params is None:
-            params = {}
+        params = dict(params or {})
         # Include related blogs and subtopics in the response
         params['expand'] = 'blogs,blogs.subtopics'
         return self._make_request('GET', 'courses/', params=params)
     
+    def iter_courses(self, params=None, page_size=100, read_ahead=None):
+        """
+        Yield every course across all pages of the catalog
+        
+        The next page is fetched in a background thread while the current
+        one is consumed, up to ``read_ahead`` pages ahead (default
+        BACKEND_API_READ_AHEAD), and pages are parsed as they download, so
+        memory stays bounded however large the catalog is. Raises
+        BackendUnavailableError if the backend fails part way through.
+        """
+        params = dict(params or {})
+        params['expand'] = 'blogs,blogs.subtopics'
+        if read_ahead is None:
+            read_ahead = getattr(settings, 'BACKEND_API_READ_AHEAD', 2)
+        return self._iter_pages('/api/courses/', params, page_size, read_ahead)
+    
+    def _iter_pages(self, endpoint, params, page_size, read_ahead):
+        """
+        Yield the results of a paginated endpoint, prefetching pages
+
+        Pages are requested by number for as long as the previous page has a
+        ``next`` link (or, without one, until ``count`` records were seen),
+        so a backend that caps page_size below the one asked for is still
+        read to the end. Without either, an empty page ends the listing. A
+        404 for a later page also means the end; any other failure raises
+        BackendUnavailableError rather than passing for a complete listing.
+        """
+        records = queue.Queue(maxsize=max(read_ahead, 1) * page_size)
+        stop = threading.Event()
+        
+        def put(item):
+            # Give up if the consumer has gone away
+            while not stop.is_set():
+                try:
+                    records.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+        
+        def produce():
+            page = 1
+            seen = 0
+            try:
+                while not stop.is_set():
+                    response = self._send('GET', endpoint, params={**params, 'page': page, 'page_size': page_size},
+                                          stream=True, client_errors=True)
+                    if response is None:
+                        # Unparseable or otherwise unusable response
+                        put(BackendUnavailable(f"page {page} could not be read", endpoint))
+                        return
+                    if isinstance(response, BackendUnavailable):
+                        put(response)
+                        return
+                    with response:
+                        if response.status_code == 404 and page > 1:
+                            # Past the last page
+                            break
+                        if response.status_code >= 400:
+                            logger.error(f"Reading {endpoint} page {page} failed: HTTP {response.status_code}")
+                            put(BackendUnavailable(f"HTTP {response.status_code}", endpoint, response.status_code))
+                            return
+                        meta = {}
+                        count = 0
+                        for record in iter_json_items(response.iter_content(chunk_size=65536), meta=meta):
+                            if not put(record):
+                                return
+                            count += 1
+                    seen += count
+                    if 'next' in meta:
+                        more = bool(meta['next'])
+                    elif isinstance(meta.get('count'), int):
+                        more = seen < meta['count']
+                    else:
+                        more = True
+                    if not more or count == 0:
+                        break
+                    page += 1
+            except Exception as e:
+                logger.error(f"Reading {endpoint} page {page} failed: {e}")
+                put(BackendUnavailable(str(e), endpoint))
+                return
+            put(_PAGES_DONE)
+        
+        producer = threading.Thread(target=produce, name='backend-api-pages', daemon=True)
+        producer.start()
+        try:
+            while True:
+                item = records.get()
+                if item is _PAGES_DONE:
+                    return
+                if isinstance(item, BackendUnavailable):
+                    raise BackendUnavailableError(item)
+                yield item
+        finally:
+            stop.set()
+    
     def get_course_detail(self, course_id):
         """
         Get detailed information about a specific course
         """
         return self._make_request('GET', f'/courses/{course_id}/')
     
+    def fetch_course_detail(self, course_id):
+        """
+        Get a course straight from the backend, bypassing the response cache
+        
+        Returns NOT_FOUND if the backend answered 404, so callers can tell a
+        deleted course from a request that failed (None for other client
+        errors, or a BackendUnavailable).
+        """
+        endpoint = f'/api/courses/{course_id}/'
+        response = self._send('GET', endpoint, stream=True, client_errors=True)
+        if response is None or is_unavailable(response):
+            return response
+        with response:
+            if response.status_code == 404:
+                return NOT_FOUND
+            if response.status_code >= 400:
+                logger.error(f"API request failed: HTTP {response.status_code} for {endpoint}")
+                return None
+            try:
+                return response.json() if response.content else {}
+            except ValueError as e:
+                logger.error(f"API request failed: {e}")
+                return None
+    
     def get_course_lessons(self, course_id):
         """
         Get lessons for a specific course
@@ -146,6 +462,30 @@ class BackendAPIClient:
         """
         return self._make_request('GET', f'/courses/{course_id}/quizzes/')
     
+    def get_course_details_many(self, course_ids, parts=('detail', 'lessons', 'quizzes')):
+        """
+        Get details, lessons and quizzes for several courses concurrently
+        
+        Returns {course_id: {part: data}} for the unique ids in the order
+        given. Each call goes through the response cache; a call that fails
+        leaves None or a BackendUnavailable for that part only.
+        """
+        course_ids = list(dict.fromkeys(course_ids))
+        futures = {
+            (course_id, part): self.bulk_executor.submit(getattr(self, COURSE_PARTS[part]), course_id)
+            for course_id in course_ids
+            for part in parts
+        }
+        
+        results = {course_id: {} for course_id in course_ids}
+        for (course_id, part), future in futures.items():
+            try:
+                results[course_id][part] = future.result()
+            except Exception as e:
+                logger.error(f"Fetching {part} for course {course_id} failed: {e}")
+                results[course_id][part] = BackendUnavailable(str(e))
+        return results
+    
     def get_lesson_detail(self, lesson_id):
         """
         Get detailed information about a specific lesson
@@ -158,23 +498,56 @@ class BackendAPIClient:
         """
         return self._make_request('GET', f'/quizzes/{quiz_id}/')
     
-    def get_user_progress(self):
+    def get_user_progress(self, user_id=None):
         """
         Get user's progress (requires authentication)
         """
-        return self._make_request('GET', '/progress/', auth_required=True)
+        return self._make_request('GET', '/progress/', auth_required=True, user_id=user_id)
     
-    def update_progress(self, progress_data):
+    def get_user_courses(self, user_id):
+        """
+        Get courses a user is enrolled in (requires authentication)
+        """
+        return self._make_request('GET', f'/users/{user_id}/courses/', auth_required=True, user_id=user_id)
+    
+    def update_progress(self, progress_data, user_id=None, wait=False):
         """
         Update user progress (requires authentication)
+        
+        Unless ``wait`` is set, the update is queued and sent in the
+        background (see services.progress_queue) and {'queued': True} is
+        returned straight away instead of the backend's response body; pass
+        ``wait=True`` to get the body.
         """
-        return self._make_request('POST', '/progress/', data=progress_data, auth_required=True)
+        if not wait and self.progress_queue and self.progress_queue.add(user_id, progress_data):
+            return {'queued': True}
+        return self._make_request('POST', '/progress/', data=progress_data, auth_required=True, user_id=user_id)
     
-    def create_course(self, course_data):
+    def _send_progress(self, user_id, progress_data):
+        """Deliver one queued progress update; returns a progress_queue outcome"""
+        response = self._send('POST', '/api/progress/', data=progress_data, auth_required=True, user_id=user_id,
+                              stream=True, client_errors=True)
+        if response is None or is_unavailable(response):
+            return RETRY
+        with response:
+            status = response.status_code
+        if status < 400:
+            return SENT
+        # 401: the user's tokens may be back once they sign in again
+        if status in (401, 408, 425, 429):
+            return RETRY
+        logger.error(f"Backend rejected progress update with HTTP {status}")
+        return REJECTED
+    
+    def create_course(self, course_data, user_id=None):
         """
         Create a new course (requires admin authentication)
         """
-        return self._make_request('POST', '/courses/', data=course_data, auth_required=True)
+        return self._make_request('POST', '/courses/', data=course_data, auth_required=True, user_id=user_id)
+    
+    def pool_stats(self):
+        """Connection pool usage per backend host"""
+        return self.transport.pool_stats()
 
 
 # Global instance
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+
+from .api_client import api_client
+from .resilience import BackendUnavailable, get_resilience_settings
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncBackendAPIClient:
+    """
+    Async counterpart of BackendAPIClient with the same methods.
+
+    Each call runs the sync client in a worker thread, so it shares the
+    connection pool, response cache, retry budget and circuit breaker with
+    the sync views. Calls run on the client's own thread pool rather than the
+    event loop's default executor, so several awaited together run
+    concurrently and a call abandoned at a deadline never holds up the loop
+    that started it.
+    """
+
+    def __init__(self, client=None, max_workers=32):
+        self.client = client or api_client
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='backend-api-async')
+
+    async def _call(self, name, *args, **kwargs):
+        func = sync_to_async(getattr(self.client, name), thread_sensitive=False, executor=self._executor)
+        return await func(*args, **kwargs)
+
+    async def authenticate(self, username, password, user_id=None):
+        return await self._call('authenticate', username, password, user_id)
+
+    async def get_courses(self, params=None):
+        return await self._call('get_courses', params)
+
+    async def get_course_detail(self, course_id):
+        return await self._call('get_course_detail', course_id)
+
+    async def get_course_lessons(self, course_id):
+        return await self._call('get_course_lessons', course_id)
+
+    async def get_course_quizzes(self, course_id):
+        return await self._call('get_course_quizzes', course_id)
+
+    async def get_course_details_many(self, course_ids, parts=('detail', 'lessons', 'quizzes')):
+        return await self._call('get_course_details_many', course_ids, parts)
+
+    async def get_lesson_detail(self, lesson_id):
+        return await self._call('get_lesson_detail', lesson_id)
+
+    async def get_quiz_detail(self, quiz_id):
+        return await self._call('get_quiz_detail', quiz_id)
+
+    async def get_user_progress(self, user_id=None):
+        return await self._call('get_user_progress', user_id)
+
+    async def get_user_courses(self, user_id):
+        return await self._call('get_user_courses', user_id)
+
+    async def update_progress(self, progress_data, user_id=None, wait=False):
+        return await self._call('update_progress', progress_data, user_id, wait)
+
+    async def create_course(self, course_data, user_id=None):
+        return await self._call('create_course', course_data, user_id)
+
+
+async def gather_with_deadline(*calls, deadline=None):
+    """
+    Await independent backend calls concurrently and return their results in
+    order. Calls still running when ``deadline`` seconds (PAGE_DEADLINE by
+    default) have passed are abandoned and yield a BackendUnavailable, so a
+    page never waits longer than its deadline.
+    """
+    if deadline is None:
+        deadline = get_resilience_settings()['PAGE_DEADLINE']
+
+    tasks = [asyncio.ensure_future(call) for call in calls]
+    done, pending = await asyncio.wait(tasks, timeout=deadline)
+    for task in pending:
+        task.cancel()
+
+    results = []
+    for task in tasks:
+        if task in pending:
+            results.append(BackendUnavailable('page deadline exceeded'))
+        elif task.exception() is not None:
+            logger.error(f"API request failed: {task.exception()}")
+            results.append(BackendUnavailable(str(task.exception())))
+        else:
+            results.append(task.result())
+    return results
+
+
+# Global instance
+async_api_client = AsyncBackendAPIClient()
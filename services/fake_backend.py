@@ -0,0 +1,235 @@
+"""
+Stand-in for the backend API, for measuring api_client and the views that
+use it without the real server at BACKEND_API_URL.
+
+It serves the endpoints the client calls with generated data, and can add
+latency, fail a share of requests with 503 and pad course payloads. GET
+responses carry an ETag and answer a matching If-None-Match with 304. Like a
+backend with sessions, token responses set a session cookie; the Cookie
+headers clients send back are recorded in ``received_cookies``.
+"""
+import base64
+import hashlib
+import json
+import random
+import re
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+def make_token(kind, lifetime):
+    """Unsigned JWT-shaped token whose exp claim the client can read"""
+    def encode(data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip('=')
+    payload = {'token_type': kind, 'exp': int(time.time() + lifetime), 'jti': secrets.token_hex(8)}
+    return f"{encode({'alg': 'none'})}.{encode(payload)}.fake"
+
+
+class FakeBackend:
+    """
+    Threaded HTTP server faking the backend API.
+
+    ``latency`` (+ up to ``jitter``) seconds are added to every request,
+    ``error_rate`` of requests get a 503, and each course carries a
+    description of ``description_bytes`` characters. Course pages hold at
+    most ``max_page_size`` courses whatever page_size is asked for, and
+    paths in ``forced_statuses`` ({path: status}) always get that status.
+    """
+
+    def __init__(self, host='127.0.0.1', port=8001, latency=0.05, jitter=0.0, error_rate=0.0,
+                 courses=200, description_bytes=500, token_lifetime=300, max_page_size=None,
+                 forced_statuses=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.courses = courses
+        self.description_bytes = description_bytes
+        self.token_lifetime = token_lifetime
+        self.max_page_size = max_page_size
+        self.forced_statuses = dict(forced_statuses or {})
+        self.valid_tokens = set()
+        self.progress = []
+        self.received_cookies = []
+        self._lock = threading.Lock()
+
+        handler = type('Handler', (FakeBackendHandler,), {'backend': self})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve in a background thread"""
+        self._thread = threading.Thread(target=self.server.serve_forever, name='fake-backend', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def issue_tokens(self):
+        access = make_token('access', self.token_lifetime)
+        with self._lock:
+            self.valid_tokens.add(access)
+        return {'access': access, 'refresh': make_token('refresh', self.token_lifetime * 24)}
+
+    def is_authorized(self, header):
+        return bool(header) and header.startswith('Bearer ') and header[7:] in self.valid_tokens
+
+    def course(self, course_id):
+        return {
+            'id': course_id,
+            'title': f'Course {course_id}',
+            'slug': f'course-{course_id}',
+            'description': ('Lorem ipsum dolor sit amet. ' * (self.description_bytes // 28 + 1))[:self.description_bytes],
+            'difficulty': ('beginner', 'intermediate', 'advanced')[course_id % 3],
+            'updated_at': '2024-01-01T00:00:00Z',
+            'blogs': [{'id': course_id * 10 + i, 'title': f'Blog {i}', 'subtopics': []} for i in range(2)],
+        }
+
+    def course_list(self, query):
+        page = int(query.get('page', ['1'])[0])
+        page_size = int(query.get('page_size', ['10'])[0])
+        if self.max_page_size:
+            page_size = min(page_size, self.max_page_size)
+        ids = range(1, self.courses + 1)
+        search = query.get('search', [''])[0].lower()
+        if search:
+            ids = [i for i in ids if search in f'course {i}']
+        ids = list(ids)
+        start = (page - 1) * page_size
+        if page < 1 or (start >= len(ids) and page > 1):
+            return 404, {'detail': 'Invalid page.'}
+        return 200, {
+            'count': len(ids),
+            'next': f'?page={page + 1}' if start + page_size < len(ids) else None,
+            'previous': f'?page={page - 1}' if page > 1 else None,
+            'results': [self.course(i) for i in ids[start:start + page_size]],
+        }
+
+
+class FakeBackendHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    backend = None
+
+    routes = [
+        ('GET', re.compile(r'^/api/courses/$'), 'courses'),
+        ('POST', re.compile(r'^/api/courses/$'), 'create_course'),
+        ('GET', re.compile(r'^/api/courses/(\d+)/$'), 'course_detail'),
+        ('GET', re.compile(r'^/api/courses/(\d+)/lessons/$'), 'course_lessons'),
+        ('GET', re.compile(r'^/api/courses/(\d+)/quizzes/$'), 'course_quizzes'),
+        ('GET', re.compile(r'^/api/lessons/(\d+)/$'), 'lesson_detail'),
+        ('GET', re.compile(r'^/api/quizzes/(\d+)/$'), 'quiz_detail'),
+        ('GET', re.compile(r'^/api/progress/$'), 'progress'),
+        ('POST', re.compile(r'^/api/progress/$'), 'update_progress'),
+        ('GET', re.compile(r'^/api/users/(\d+)/courses/$'), 'user_courses'),
+        ('POST', re.compile(r'^/api/token/$'), 'token'),
+        ('POST', re.compile(r'^/api/token/refresh/$'), 'token'),
+    ]
+    authenticated = {'create_course', 'progress', 'update_progress', 'user_courses'}
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def _dispatch(self, method):
+        backend = self.backend
+        url = urlsplit(self.path)
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        self.set_cookie = None
+        if self.headers.get('Cookie'):
+            backend.received_cookies.append(self.headers['Cookie'])
+
+        time.sleep(backend.latency + random.uniform(0, backend.jitter))
+        if backend.error_rate and random.random() < backend.error_rate:
+            return self._respond(503, {'detail': 'Service unavailable.'})
+
+        if url.path in backend.forced_statuses:
+            return self._respond(backend.forced_statuses[url.path], {'detail': 'Forced status.'})
+
+        for route_method, pattern, name in self.routes:
+            match = pattern.match(url.path)
+            if route_method == method and match:
+                if name in self.authenticated and not backend.is_authorized(self.headers.get('Authorization')):
+                    return self._respond(401, {'detail': 'Authentication credentials were not provided.'})
+                args = [int(arg) for arg in match.groups()]
+                status, data = getattr(self, f'handle_{name}')(parse_qs(url.query), body, *args)
+                return self._respond(status, data, conditional=method == 'GET')
+        self._respond(404, {'detail': 'Not found.'})
+
+    def _respond(self, status, data, conditional=False):
+        payload = json.dumps(data).encode()
+        if conditional and status == 200:
+            etag = f'"{hashlib.sha1(payload).hexdigest()[:20]}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+        self.send_response(status)
+        if conditional and status == 200:
+            self.send_header('ETag', etag)
+        if self.set_cookie:
+            self.send_header('Set-Cookie', self.set_cookie)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def handle_courses(self, query, body):
+        return self.backend.course_list(query)
+
+    def handle_create_course(self, query, body):
+        return 201, {'id': self.backend.courses + 1, **json.loads(body or b'{}')}
+
+    def handle_course_detail(self, query, body, course_id):
+        if not 1 <= course_id <= self.backend.courses:
+            return 404, {'detail': 'Not found.'}
+        return 200, self.backend.course(course_id)
+
+    def handle_course_lessons(self, query, body, course_id):
+        return 200, {'results': [{'id': course_id * 100 + i, 'title': f'Lesson {i}'} for i in range(1, 6)]}
+
+    def handle_course_quizzes(self, query, body, course_id):
+        return 200, {'results': [{'id': course_id * 100 + i, 'title': f'Quiz {i}'} for i in range(1, 3)]}
+
+    def handle_lesson_detail(self, query, body, lesson_id):
+        return 200, {'id': lesson_id, 'title': f'Lesson {lesson_id}', 'content': 'x' * self.backend.description_bytes}
+
+    def handle_quiz_detail(self, query, body, quiz_id):
+        return 200, {'id': quiz_id, 'title': f'Quiz {quiz_id}', 'questions': []}
+
+    def handle_progress(self, query, body):
+        return 200, {'results': [{'course': i, 'progress': i * 10 % 100} for i in range(1, 6)]}
+
+    def handle_update_progress(self, query, body):
+        data = json.loads(body or b'{}')
+        with self.backend._lock:
+            self.backend.progress.append(data)
+        return 201, data
+
+    def handle_user_courses(self, query, body, user_id):
+        return 200, {'results': [self.backend.course(i) for i in range(1, 4)]}
+
+    def handle_token(self, query, body):
+        # Any credentials (or refresh token) are accepted
+        self.set_cookie = f'sessionid={secrets.token_hex(8)}; Path=/'
+        return 200, self.backend.issue_tokens()
@@ -0,0 +1,117 @@
+"""
+Purging cached backend data when the backend reports changes.
+
+The backend (or a stand-in, see the send_backend_webhook command) POSTs the
+entities that changed to the webhook view in core.views_webhooks:
+
+    {"entities": [{"type": "course", "id": 12},
+                  {"type": "lesson", "id": 5, "course": 12}]}
+
+The body is signed with HMAC-SHA256 over "<timestamp>.<body>" using the
+shared BACKEND_WEBHOOK['SECRET'], sent as
+
+    X-Webhook-Timestamp: <unix seconds>
+    X-Webhook-Signature: sha256=<hex digest>
+
+Each entity maps to the response-cache tags of exactly the endpoints that
+serve it, which are then purged. Receivers of ``backend_entities_changed``
+update anything else rendered from backend data, such as the replicated
+course catalog.
+"""
+import hashlib
+import hmac
+import logging
+import time
+
+from django.conf import settings
+from django.dispatch import Signal
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'SECRET': '',  # webhooks are rejected while no secret is configured
+    'TOLERANCE': 300,  # seconds a signed request stays valid
+    'MAX_ENTITIES': 1000,
+}
+
+SIGNATURE_HEADER = 'X-Webhook-Signature'
+TIMESTAMP_HEADER = 'X-Webhook-Timestamp'
+
+ENTITY_TYPES = ('course', 'lesson', 'quiz')
+
+# Sent with entities=[{'type': ..., 'id': ..., ...}] after their cache entries were purged
+backend_entities_changed = Signal()
+
+
+def get_webhook_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'BACKEND_WEBHOOK', {})}
+
+
+def sign(body, timestamp, secret):
+    """Signature header value for a webhook ``body`` (bytes) sent at ``timestamp``"""
+    message = f'{timestamp}.'.encode() + body
+    return 'sha256=' + hmac.new(secret.encode(), message, hashlib.sha256).hexdigest()
+
+
+def verify_signature(body, timestamp, signature, secret, tolerance=300):
+    """Whether ``signature`` is valid for ``body`` and ``timestamp`` is recent enough"""
+    if not secret or not timestamp or not signature:
+        return False
+    try:
+        age = abs(time.time() - int(timestamp))
+    except ValueError:
+        return False
+    if age > tolerance:
+        return False
+    return hmac.compare_digest(sign(body, timestamp, secret), signature)
+
+
+def entity_tags(entity):
+    """
+    Response-cache tags of the endpoints serving ``entity`` (see
+    services.response_cache.TAG_PATTERNS).
+
+    A lesson or quiz without its course purges every course's lesson or
+    quiz list, since the one it belongs to is not known.
+    """
+    kind, entity_id = entity['type'], entity['id']
+    if kind == 'course':
+        return [f'course:{entity_id}', f'course:{entity_id}:lessons', f'course:{entity_id}:quizzes', 'courses']
+    if kind == 'lesson':
+        course = entity.get('course')
+        return [f'lesson:{entity_id}', f'course:{course}:lessons' if course is not None else 'lessons']
+    if kind == 'quiz':
+        course = entity.get('course')
+        return [f'quiz:{entity_id}', f'course:{course}:quizzes' if course is not None else 'quizzes']
+    raise ValueError(f"Unknown entity type: {kind}")
+
+
+def parse_entities(payload, max_entities=1000):
+    """Validated entities from a webhook payload; raises ValueError if malformed"""
+    entities = payload.get('entities') if isinstance(payload, dict) else None
+    if not isinstance(entities, list) or not entities:
+        raise ValueError("'entities' must be a non-empty list")
+    if len(entities) > max_entities:
+        raise ValueError(f"At most {max_entities} entities per request")
+
+    parsed = []
+    for entity in entities:
+        if not isinstance(entity, dict) or entity.get('type') not in ENTITY_TYPES:
+            raise ValueError(f"Each entity needs a 'type' out of {', '.join(ENTITY_TYPES)}")
+        if not isinstance(entity.get('id'), (int, str)) or isinstance(entity['id'], bool) or entity['id'] == '':
+            raise ValueError("Each entity needs an 'id'")
+        parsed.append(entity)
+    return parsed
+
+
+def purge_entities(entities, response_cache):
+    """
+    Purge the cache entries serving ``entities`` and notify receivers.
+    Returns the purged tags.
+    """
+    tags = sorted({tag for entity in entities for tag in entity_tags(entity)})
+    snapshots = response_cache.purge_tags(tags) if response_cache else 0
+    logger.info("Purged %d cache tags (%d snapshots) for %d changed backend entities",
+                len(tags), snapshots, len(entities))
+    backend_entities_changed.send(sender=None, entities=entities)
+    return tags
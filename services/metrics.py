@@ -0,0 +1,209 @@
+"""
+In-process metrics for outbound backend API calls.
+
+The registry keeps per-endpoint latency histograms, status codes, bytes
+sent and received, and retries, plus counters for cache hits and misses,
+token refreshes and circuit-breaker rejections. Each process publishes a
+snapshot to the cache every PUBLISH_INTERVAL seconds, so the metrics
+endpoint and the dump command can merge what every worker saw.
+"""
+import logging
+import os
+import re
+import socket
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds; the last bucket is everything slower
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+INDEX_KEY = 'backend_api_metrics:processes'
+
+_ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+
+
+def endpoint_label(method, path):
+    """'GET /api/courses/12/lessons/' -> 'GET /api/courses/{id}/lessons/'"""
+    return f"{method} {_ID_SEGMENT.sub('/{id}', path)}"
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def as_dict(self):
+        return {'buckets': list(self.buckets), 'counts': list(self.counts), 'count': self.count, 'sum': self.sum}
+
+
+def merge_histograms(a, b):
+    return {
+        'buckets': a['buckets'],
+        'counts': [x + y for x, y in zip(a['counts'], b['counts'])],
+        'count': a['count'] + b['count'],
+        'sum': a['sum'] + b['sum'],
+    }
+
+
+def histogram_percentile(histogram, pct):
+    """Upper bound of the bucket holding the ``pct`` percentile (None if empty or off the scale)"""
+    target = histogram['count'] * pct / 100
+    seen = 0
+    for bound, count in zip(histogram['buckets'] + [None], histogram['counts']):
+        seen += count
+        if count and seen >= target:
+            return bound
+    return None
+
+
+class MetricsRegistry:
+    def __init__(self, publish_interval=10):
+        self.publish_interval = publish_interval
+        self._lock = threading.Lock()
+        self._last_publish = 0.0
+        self.reset()
+
+    @property
+    def process(self):
+        # Looked up on use, so forked workers publish under their own pid
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def reset(self):
+        with self._lock:
+            self.started = time.time()
+            self.endpoints = {}
+            self.counters = Counter()
+
+    def _endpoint(self, label):
+        stats = self.endpoints.get(label)
+        if stats is None:
+            stats = self.endpoints[label] = {
+                'latency': Histogram(),
+                'statuses': Counter(),
+                'bytes_sent': 0,
+                'bytes_received': 0,
+                'retries': 0,
+            }
+        return stats
+
+    def record_request(self, method, path, status, seconds, bytes_sent=0, bytes_received=0):
+        """One HTTP exchange; ``status`` is None when no response came back"""
+        with self._lock:
+            stats = self._endpoint(endpoint_label(method, path))
+            stats['latency'].observe(seconds)
+            stats['statuses'][str(status) if status is not None else 'error'] += 1
+            stats['bytes_sent'] += bytes_sent
+            stats['bytes_received'] += bytes_received
+        self.maybe_publish()
+
+    def record_retry(self, method, path):
+        with self._lock:
+            self._endpoint(endpoint_label(method, path))['retries'] += 1
+
+    def increment(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'processes': [self.process],
+                'since': self.started,
+                'counters': dict(self.counters),
+                'endpoints': {
+                    label: {
+                        'latency': stats['latency'].as_dict(),
+                        'statuses': dict(stats['statuses']),
+                        'bytes_sent': stats['bytes_sent'],
+                        'bytes_received': stats['bytes_received'],
+                        'retries': stats['retries'],
+                    }
+                    for label, stats in self.endpoints.items()
+                },
+            }
+
+    def maybe_publish(self):
+        now = time.monotonic()
+        if now - self._last_publish < self.publish_interval:
+            return
+        self._last_publish = now
+        try:
+            self.publish()
+        except Exception:
+            logger.exception("Publishing backend API metrics failed")
+
+    def publish(self):
+        """Store this process's snapshot in the cache"""
+        key = f"backend_api_metrics:{self.process}"
+        timeout = self.publish_interval * 6
+        cache.set(key, self.snapshot(), timeout=timeout)
+        index = cache.get(INDEX_KEY) or {}
+        index[key] = time.time()
+        # Forget processes that stopped publishing
+        index = {k: seen for k, seen in index.items() if time.time() - seen < timeout}
+        cache.set(INDEX_KEY, index, timeout=None)
+
+
+def merge_snapshots(snapshots):
+    merged = {'processes': [], 'since': None, 'counters': Counter(), 'endpoints': {}}
+    for snapshot in snapshots:
+        merged['processes'] += snapshot['processes']
+        merged['since'] = min(filter(None, [merged['since'], snapshot['since']]))
+        merged['counters'].update(snapshot['counters'])
+        for label, stats in snapshot['endpoints'].items():
+            current = merged['endpoints'].get(label)
+            if current is None:
+                merged['endpoints'][label] = {**stats, 'statuses': dict(stats['statuses'])}
+                continue
+            current['latency'] = merge_histograms(current['latency'], stats['latency'])
+            current['statuses'] = dict(Counter(current['statuses']) + Counter(stats['statuses']))
+            for field in ('bytes_sent', 'bytes_received', 'retries'):
+                current[field] += stats[field]
+    merged['counters'] = dict(merged['counters'])
+    return merged
+
+
+def collect_metrics():
+    """
+    Metrics of every process that published recently, with this one's live
+    numbers and latency percentiles estimated from the histograms
+    """
+    index = cache.get(INDEX_KEY) or {}
+    own_key = f"backend_api_metrics:{metrics.process}"
+    published = cache.get_many([key for key in index if key != own_key])
+    merged = merge_snapshots([metrics.snapshot(), *published.values()])
+
+    for stats in merged['endpoints'].values():
+        latency = stats['latency']
+        stats['requests'] = latency['count']
+        stats['latency_mean'] = latency['sum'] / latency['count'] if latency['count'] else None
+        for pct in (50, 95, 99):
+            stats[f'latency_p{pct}'] = histogram_percentile(latency, pct)
+
+    counters = merged['counters']
+    lookups = sum(counters.get(name, 0) for name in ('cache_hits', 'cache_stale_hits', 'cache_misses'))
+    if lookups:
+        merged['cache_hit_rate'] = (counters.get('cache_hits', 0) + counters.get('cache_stale_hits', 0)) / lookups
+    return merged
+
+
+# Global instance
+metrics = MetricsRegistry(publish_interval=getattr(settings, 'BACKEND_API_METRICS_PUBLISH_INTERVAL', 10))
@@ -0,0 +1,279 @@
+"""
+Write-behind queue for progress updates sent to the backend API.
+
+update_progress() stores the update in a local SQLite file and returns. Only
+the latest update per (user, course) is kept, so a lesson reporting many
+checkpoints becomes one request. A background thread sends due updates in
+batches every FLUSH_INTERVAL seconds, or sooner once BATCH_SIZE are
+waiting, and retries transient failures with exponential backoff; updates
+the backend rejects outright (4xx other than 401/408/429) are dropped at
+once. Because the queue lives on disk it survives restarts and crashes, and
+worker processes share it: each batch is claimed before it is sent, so no
+update goes out twice at the same time.
+
+The backend has no bulk progress endpoint, so a batch is one POST per
+merged update, sent concurrently; merging is what cuts the calls.
+
+Updates are sent with the user's backend tokens from the Django cache. If
+those are gone after a restart, leftover updates get 401s and are retried
+until the user signs in to the backend again or MAX_ATTEMPTS runs out.
+"""
+import atexit
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+
+from .resilience import backoff_delay
+
+logger = logging.getLogger(__name__)
+
+# Outcomes of ``send``
+SENT = 'sent'
+RETRY = 'retry'  # transient failure; try again later
+REJECTED = 'rejected'  # the backend refused the update; retrying will not help
+
+DEFAULT_SETTINGS = {
+    'ENABLED': True,
+    'PATH': None,  # defaults to BASE_DIR / 'backend_progress_queue.sqlite3'
+    'BATCH_SIZE': 50,
+    'FLUSH_INTERVAL': 2.0,  # seconds
+    'MAX_ATTEMPTS': 10,  # failed sends before an update is dropped
+    'BACKOFF_BASE': 1.0,  # seconds
+    'BACKOFF_CAP': 300.0,
+    'CLAIM_TIMEOUT': 60,  # seconds a process may hold a batch before others may retry it
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending_progress (
+    user_id TEXT NOT NULL,
+    course TEXT NOT NULL,
+    data TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 1,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    claimed_until REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, course)
+)
+"""
+
+
+def course_of(progress_data):
+    """The course a progress update is about, or None if it does not say"""
+    for field in ('course', 'course_id'):
+        if progress_data.get(field) is not None:
+            return str(progress_data[field])
+    return None
+
+
+class ProgressQueue:
+    """
+    Durable, merging queue of progress updates with a background sender.
+
+    ``send(user_id, data)`` delivers one update and returns SENT, RETRY or
+    REJECTED. A batch's updates are sent concurrently on ``executor`` if
+    given, else one after another.
+    """
+
+    def __init__(self, path, send, batch_size=50, flush_interval=2.0, max_attempts=10,
+                 backoff_base=1.0, backoff_cap=300.0, claim_timeout=60, executor=None):
+        self.path = str(path)
+        self.send = send
+        self.executor = executor
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.claim_timeout = claim_timeout
+        self.added_since_flush = 0
+
+        self._local = threading.local()
+        self._start_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._atexit_registered = False
+
+    @classmethod
+    def from_settings(cls, send, executor=None):
+        options = {**DEFAULT_SETTINGS, **getattr(settings, 'BACKEND_API_PROGRESS_QUEUE', {})}
+        if not options['ENABLED']:
+            return None
+        return cls(
+            options['PATH'] or settings.BASE_DIR / 'backend_progress_queue.sqlite3',
+            send,
+            batch_size=options['BATCH_SIZE'],
+            flush_interval=options['FLUSH_INTERVAL'],
+            max_attempts=options['MAX_ATTEMPTS'],
+            backoff_base=options['BACKOFF_BASE'],
+            backoff_cap=options['BACKOFF_CAP'],
+            claim_timeout=options['CLAIM_TIMEOUT'],
+            executor=executor,
+        )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def add(self, user_id, progress_data):
+        """
+        Queue an update, replacing any unsent one for the same user and
+        course. Returns False if the update names no course and so cannot
+        be queued.
+        """
+        course = course_of(progress_data)
+        if course is None:
+            return False
+
+        self._ensure_started()
+        self._connection().execute(
+            'INSERT INTO pending_progress (user_id, course, data) VALUES (?, ?, ?) '
+            'ON CONFLICT (user_id, course) DO UPDATE SET '
+            'data = excluded.data, version = version + 1, attempts = 0, next_attempt = 0',
+            (self._user_key(user_id), course, json.dumps(progress_data)),
+        )
+        self.added_since_flush += 1
+        if self.added_since_flush >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    def pending(self):
+        return self._connection().execute('SELECT COUNT(*) FROM pending_progress').fetchone()[0]
+
+    def flush(self):
+        """Send every due update. Returns the number delivered."""
+        delivered = 0
+        # Updates that fail during this flush are due again only after it
+        started = time.time()
+        with self._flush_lock:
+            self.added_since_flush = 0
+            while True:
+                batch = self._claim(started)
+                if not batch:
+                    break
+                delivered += self._deliver(batch)
+        return delivered
+
+    def start_if_pending(self):
+        """Start the sender if updates were left over from an earlier run"""
+        if os.path.exists(self.path) and self.pending():
+            self._ensure_started()
+            self._wakeup.set()
+
+    def shutdown(self, timeout=5.0):
+        """Stop the sender; unsent updates stay on disk for the next start"""
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
+
+    @staticmethod
+    def _user_key(user_id):
+        return '' if user_id is None else str(user_id)
+
+    def _claim(self, due_by):
+        """Mark up to batch_size updates due by ``due_by`` as taken by this process and return them"""
+        conn = self._connection()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            rows = conn.execute(
+                'SELECT user_id, course, data, version, attempts FROM pending_progress '
+                'WHERE next_attempt <= ? AND claimed_until <= ? ORDER BY next_attempt LIMIT ?',
+                (due_by, now, self.batch_size),
+            ).fetchall()
+            conn.executemany(
+                'UPDATE pending_progress SET claimed_until = ? WHERE user_id = ? AND course = ?',
+                [(now + self.claim_timeout, user_id, course) for user_id, course, *_ in rows],
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return rows
+
+    def _send_one(self, user_id, course, data):
+        try:
+            return self.send(int(user_id) if user_id else None, json.loads(data))
+        except Exception:
+            logger.exception("Sending progress for user %s, course %s failed", user_id, course)
+            return RETRY
+
+    def _deliver(self, batch):
+        if self.executor is not None:
+            futures = [self.executor.submit(self._send_one, user_id, course, data)
+                       for user_id, course, data, *_ in batch]
+            outcomes = [future.result() for future in futures]
+        else:
+            outcomes = [self._send_one(user_id, course, data) for user_id, course, data, *_ in batch]
+
+        conn = self._connection()
+        delivered = 0
+        for (user_id, course, data, version, attempts), outcome in zip(batch, outcomes):
+            if outcome == SENT:
+                delivered += 1
+                # A newer update that arrived meanwhile stays queued
+                conn.execute(
+                    'DELETE FROM pending_progress WHERE user_id = ? AND course = ? AND version = ?',
+                    (user_id, course, version),
+                )
+            elif outcome == REJECTED or attempts + 1 >= self.max_attempts:
+                logger.error("Dropping progress for user %s, course %s after %d attempts (%s)",
+                             user_id, course, attempts + 1, outcome)
+                conn.execute(
+                    'DELETE FROM pending_progress WHERE user_id = ? AND course = ? AND version = ?',
+                    (user_id, course, version),
+                )
+            else:
+                retry_at = time.time() + self.backoff_base + backoff_delay(attempts, self.backoff_base,
+                                                                           self.backoff_cap)
+                conn.execute(
+                    'UPDATE pending_progress SET attempts = attempts + 1, next_attempt = ? '
+                    'WHERE user_id = ? AND course = ? AND version = ?',
+                    (retry_at, user_id, course, version),
+                )
+            conn.execute(
+                'UPDATE pending_progress SET claimed_until = 0 WHERE user_id = ? AND course = ?',
+                (user_id, course),
+            )
+        return delivered
+
+    def _ensure_started(self):
+        # The pid check restarts the sender in worker processes forked after
+        # the parent had already started one.
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._stopping.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='backend-progress-queue', daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.shutdown)
+                self._atexit_registered = True
+
+    def _run(self):
+        while not self._stopping.is_set():
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            if self._stopping.is_set():
+                break
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Progress queue flush failed")
+
@@ -0,0 +1,197 @@
+import fnmatch
+import random
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+DEFAULT_SETTINGS = {
+    # (connect, read) timeouts in seconds, matched in order against the
+    # endpoint without /api/; DEFAULT applies when nothing matches
+    'TIMEOUTS': {
+        'token/*': (3.05, 5),
+        'progress/': (3.05, 5),
+        'DEFAULT': (3.05, 10),
+    },
+    'MAX_RETRIES': 2,
+    'BACKOFF_BASE': 0.1,  # seconds
+    'BACKOFF_CAP': 2.0,
+    'RETRY_BUDGET_RATIO': 0.2,  # retries allowed per request sent
+    'RETRY_BUDGET_MIN_PER_SECOND': 1.0,
+    'BREAKER_WINDOW': 30,  # seconds of outcomes considered
+    'BREAKER_MIN_REQUESTS': 10,
+    'BREAKER_ERROR_RATE': 0.5,
+    'BREAKER_RESET_TIMEOUT': 15,  # seconds open before a probe is allowed
+    'PAGE_DEADLINE': 8,  # seconds an async view waits for its backend calls
+}
+
+
+def get_resilience_settings():
+    return {**DEFAULT_SETTINGS, **getattr(settings, 'BACKEND_API_RESILIENCE', {})}
+
+
+class BackendUnavailable:
+    """
+    Result returned instead of a response body when the backend could not
+    answer: connection error, timeout, 5xx, or an open circuit breaker.
+
+    It is falsy and behaves like an empty response, so existing
+    ``if data and 'results' in data`` checks keep working; views that care can
+    test ``isinstance(result, BackendUnavailable)`` and render around it.
+    """
+
+    def __init__(self, reason, endpoint=None, status_code=None):
+        self.reason = reason
+        self.endpoint = endpoint
+        self.status_code = status_code
+
+    def __bool__(self):
+        return False
+
+    def __contains__(self, key):
+        return False
+
+    def get(self, key, default=None):
+        return default
+
+    def __repr__(self):
+        return f"<BackendUnavailable {self.endpoint}: {self.reason}>"
+
+
+class BackendUnavailableError(Exception):
+    """
+    Raised with a BackendUnavailable where no result can be returned in its
+    place, such as part way through iterating over pages.
+    """
+
+    def __init__(self, result):
+        self.result = result
+        super().__init__(result.reason)
+
+
+def is_unavailable(result):
+    return isinstance(result, BackendUnavailable)
+
+
+def timeout_for(endpoint, timeouts):
+    path = endpoint[len('/api/'):] if endpoint.startswith('/api/') else endpoint.lstrip('/')
+    for pattern, timeout in timeouts.items():
+        if pattern != 'DEFAULT' and fnmatch.fnmatchcase(path, pattern):
+            return tuple(timeout)
+    return tuple(timeouts.get('DEFAULT', DEFAULT_SETTINGS['TIMEOUTS']['DEFAULT']))
+
+
+def backoff_delay(attempt, base, cap):
+    """Full-jitter exponential backoff for retry number ``attempt`` (from 0)"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+class RetryBudget:
+    """
+    Token bucket shared by all requests: each request deposits ``ratio``
+    tokens, each retry spends one, and ``min_per_second`` tokens trickle in so
+    a quiet client can still retry. Under a backend incident retries are capped
+    at a fraction of traffic instead of multiplying it.
+    """
+
+    def __init__(self, ratio=0.2, min_per_second=1.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = max(10.0, min_per_second * 10)
+        self._balance = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._balance = min(self.capacity, self._balance + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def record_request(self):
+        with self._lock:
+            self._refill()
+            self._balance = min(self.capacity, self._balance + self.ratio)
+
+    def try_spend(self):
+        """Take one retry from the budget; False if it is exhausted"""
+        with self._lock:
+            self._refill()
+            if self._balance < 1:
+                return False
+            self._balance -= 1
+            return True
+
+
+class CircuitBreaker:
+    """
+    Opens once the error rate over the last ``window`` seconds crosses
+    ``error_rate`` (with at least ``min_requests`` outcomes). While open every
+    call fails fast; after ``reset_timeout`` one probe is let through
+    (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, window=30, min_requests=10, error_rate=0.5, reset_timeout=15):
+        self.window = window
+        self.min_requests = min_requests
+        self.error_rate = error_rate
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._outcomes = deque()
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+            self._record(True)
+
+    def release_probe(self):
+        """
+        Let another probe through when the half-open probe ended without an
+        outcome (e.g. an unexpected exception)
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._open()
+                return
+            self._record(False)
+            failures = sum(1 for _, ok in self._outcomes if not ok)
+            if len(self._outcomes) >= self.min_requests and failures / len(self._outcomes) >= self.error_rate:
+                self._open()
+
+    def _record(self, ok):
+        now = time.monotonic()
+        self._outcomes.append((now, ok))
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            self._outcomes.popleft()
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._probe_in_flight = False
+        self._outcomes.clear()
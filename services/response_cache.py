@@ -0,0 +1,331 @@
+import fnmatch
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .metrics import metrics
+from .resilience import is_unavailable
+from .singleflight import SingleFlight
+from .snapshot_store import SnapshotStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'ENABLED': True,
+    'DEFAULT_TTL': 60,  # seconds an entry is fresh
+    'STALE_TTL': 300,  # seconds past expiry an entry may still be served while refreshing
+    'REFRESH_WORKERS': 2,
+    'FILL_LOCK_TIMEOUT': 15,  # seconds a process may hold the fill lock for a key
+    'FILL_WAIT_TIMEOUT': 10,  # seconds other processes wait for that fill
+    'REVALIDATE_TTL': 3600,  # seconds past STALE_TTL an entry is kept for conditional requests
+    # Per-endpoint TTLs, matched in order against the endpoint without /api/
+    'TTLS': {
+        'courses/': 300,
+        'courses/*/lessons/': 600,
+        'courses/*/quizzes/': 600,
+        'courses/*/': 600,
+        'lessons/*/': 600,
+        'quizzes/*/': 600,
+    },
+}
+
+# Returned by a fetch when the backend answered 304 Not Modified
+NOT_MODIFIED = object()
+
+# Invalidation tags of each endpoint (without /api/); services.invalidation
+# maps changed backend entities to the same tags
+TAG_PATTERNS = [
+    (re.compile(r'^courses/$'), ('courses',)),
+    (re.compile(r'^courses/(?P<id>[^/]+)/$'), ('course:{id}',)),
+    (re.compile(r'^courses/(?P<id>[^/]+)/lessons/$'), ('course:{id}:lessons', 'lessons')),
+    (re.compile(r'^courses/(?P<id>[^/]+)/quizzes/$'), ('course:{id}:quizzes', 'quizzes')),
+    (re.compile(r'^lessons/(?P<id>[^/]+)/$'), ('lesson:{id}',)),
+    (re.compile(r'^quizzes/(?P<id>[^/]+)/$'), ('quiz:{id}',)),
+]
+
+TAG_VERSION_KEY = 'backend_api_tag:{}'
+
+
+def endpoint_tags(endpoint):
+    """'/api/courses/12/lessons/' -> ['course:12:lessons', 'lessons']"""
+    path = endpoint[len('/api/'):] if endpoint.startswith('/api/') else endpoint.lstrip('/')
+    for pattern, tags in TAG_PATTERNS:
+        match = pattern.match(path)
+        if match:
+            return [tag.format(**match.groupdict()) for tag in tags]
+    return []
+
+
+class ResponseCache:
+    """TTL cache for backend API responses with stale-while-revalidate, tag purges and disk snapshots"""
+
+    FILL_POLL_INTERVAL = 0.05  # seconds
+
+    def __init__(self, backend=None, default_ttl=60, stale_ttl=300, ttls=None, refresh_workers=2,
+                 fill_lock_timeout=15, fill_wait_timeout=10, revalidate_ttl=3600, snapshots=None):
+        self.backend = backend or cache
+        self.snapshots = snapshots
+        self.default_ttl = default_ttl
+        self.stale_ttl = stale_ttl
+        self.revalidate_ttl = revalidate_ttl
+        self.ttls = ttls or {}
+        self.fill_lock_timeout = fill_lock_timeout
+        self.fill_wait_timeout = fill_wait_timeout
+        self.singleflight = SingleFlight()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix='backend-api-refresh')
+
+    @classmethod
+    def from_settings(cls):
+        options = {**DEFAULT_SETTINGS, **getattr(settings, 'BACKEND_API_CACHE', {})}
+        if not options['ENABLED']:
+            return None
+        return cls(
+            default_ttl=options['DEFAULT_TTL'],
+            stale_ttl=options['STALE_TTL'],
+            ttls=options['TTLS'],
+            refresh_workers=options['REFRESH_WORKERS'],
+            fill_lock_timeout=options['FILL_LOCK_TIMEOUT'],
+            fill_wait_timeout=options['FILL_WAIT_TIMEOUT'],
+            revalidate_ttl=options['REVALIDATE_TTL'],
+            snapshots=SnapshotStore.from_settings(),
+        )
+
+    @staticmethod
+    def make_key(method, endpoint, params=None, scope=None):
+        """
+        Cache key for a request. ``scope`` is None for entries shared by all
+        users; otherwise it identifies whose credentials the response used.
+        """
+        normalized = sorted((str(k), str(v)) for k, v in (params or {}).items())
+        raw = json.dumps([method.upper(), endpoint, normalized, scope])
+        return f"backend_api:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+    def ttl_for(self, endpoint):
+        path = endpoint[len('/api/'):] if endpoint.startswith('/api/') else endpoint.lstrip('/')
+        for pattern, ttl in self.ttls.items():
+            if fnmatch.fnmatchcase(path, pattern):
+                return ttl
+        return self.default_ttl
+
+    def get(self, key):
+        """
+        The entry for ``key``, or None if missing or purged since it was
+        stored. A tag version the cache evicted counts as purged.
+        """
+        entry = self.backend.get(key)
+        if entry is not None and entry.get('tags'):
+            if self.tag_versions(entry['tags'], create=False) != entry['tags']:
+                metrics.increment('cache_purged_hits')
+                return None
+        return entry
+
+    def set(self, key, endpoint, body, validators=None, ttl=None, tags=None):
+        """
+        Store an entry, fresh for ``ttl`` seconds (default: the endpoint's
+        TTL). ``tags`` are the tag versions read before the body was
+        fetched, so a purge that lands mid-fetch still invalidates it.
+        """
+        if ttl is None:
+            ttl = self.ttl_for(endpoint)
+        if tags is None:
+            tags = self.tag_versions(endpoint_tags(endpoint))
+        now = time.time()
+        entry = {
+            'body': body,
+            'fresh_until': now + ttl,
+            'stale_until': now + ttl + self.stale_ttl,
+            'validators': validators if validators and any(validators.values()) else None,
+            'tags': tags,
+        }
+        # Entries with validators are kept longer for conditional requests
+        timeout = ttl + self.stale_ttl + (self.revalidate_ttl if entry['validators'] else 0)
+        self.backend.set(key, entry, timeout=timeout)
+        return entry
+
+    def delete(self, key):
+        self.backend.delete(key)
+
+    def tag_versions(self, tags, create=True):
+        """
+        {tag: current version} for ``tags``. Missing versions are created,
+        or left as None with ``create`` off.
+        """
+        if not tags:
+            return {}
+        keys = {tag: TAG_VERSION_KEY.format(tag) for tag in tags}
+        stored = self.backend.get_many(list(keys.values()))
+        missing = [tag for tag in tags if keys[tag] not in stored]
+        if missing and create:
+            for tag in missing:
+                self.backend.add(keys[tag], time.time_ns(), timeout=None)
+            # Another process may have added the key first
+            stored.update(self.backend.get_many([keys[tag] for tag in missing]))
+        return {tag: stored.get(keys[tag]) for tag in tags}
+
+    def purge_tags(self, tags):
+        """
+        Invalidate every entry and snapshot carrying any of ``tags``, so TTLs
+        can be long while changes the backend announces show up at once.
+        Returns how many snapshots were deleted.
+        """
+        tags = set(tags)
+        for tag in tags:
+            key = TAG_VERSION_KEY.format(tag)
+            # incr is atomic in Redis and Memcached. A missing key gets a fresh,
+            # never-used version, so entries stamped before it was evicted
+            # cannot become valid again.
+            try:
+                self.backend.incr(key)
+            except ValueError:
+                if not self.backend.add(key, time.time_ns(), timeout=None):
+                    self.backend.incr(key)
+        metrics.increment('cache_tag_purges', len(tags))
+        if not self.snapshots:
+            return 0
+        # Otherwise a failing backend would bring the purged copy back
+        endpoints = [endpoint for endpoint in self.snapshots.endpoints() if tags.intersection(endpoint_tags(endpoint))]
+        return self.snapshots.delete_endpoints(endpoints)
+
+    def get_or_fetch(self, key, endpoint, fetch):
+        """
+        Return the cached body for ``key``, calling ``fetch`` on a miss.
+
+        Expired entries are still returned for STALE_TTL seconds while one
+        background refresh fetches a new copy, so only cold misses wait.
+        Concurrent misses share one fetch: threads through single-flight,
+        processes through a lock key in the cache.
+
+        ``fetch(validators)`` returns (body, validators): the parsed body,
+        NOT_MODIFIED if the cached entry's validators still match, or None /
+        BackendUnavailable on failure; failures are never cached.
+        """
+        entry = self.get(key)
+        now = time.time()
+        if entry is not None:
+            if now < entry['fresh_until']:
+                metrics.increment('cache_hits')
+                return entry['body']
+            if now < entry['stale_until']:
+                metrics.increment('cache_stale_hits')
+                self._refresh_in_background(key, endpoint, fetch)
+                return entry['body']
+
+        # Misses, and entries only kept for revalidation, are filled inline
+        metrics.increment('cache_misses')
+        return self.singleflight.do(key, lambda: self._fill(key, endpoint, fetch))
+
+    def _fill(self, key, endpoint, fetch):
+        # The previous leader for this key may have just stored an entry
+        entry = self.get(key)
+        if entry is not None and time.time() < entry['fresh_until']:
+            return entry['body']
+
+        lock_key = f"{key}:lock"
+        locked = self.backend.add(lock_key, os.getpid(), timeout=self.fill_lock_timeout)
+        if not locked:
+            # Another process is fetching this key; wait for its entry
+            deadline = time.monotonic() + self.fill_wait_timeout
+            while time.monotonic() < deadline:
+                time.sleep(self.FILL_POLL_INTERVAL)
+                entry = self.get(key)
+                if entry is not None and time.time() < entry['fresh_until']:
+                    return entry['body']
+                if self.backend.get(lock_key) is None:
+                    break
+
+        try:
+            return self._store(key, endpoint, entry, fetch)
+        finally:
+            if locked:
+                self.backend.delete(lock_key)
+
+    def _store(self, key, endpoint, entry, fetch):
+        """
+        Fetch, cache and return the body. Entries with an ETag or
+        Last-Modified outlive STALE_TTL by REVALIDATE_TTL, so they are
+        revalidated with a conditional request and a 304 renews them
+        without reading a body.
+        """
+        validators = entry.get('validators') if entry is not None else None
+        tags = self.tag_versions(endpoint_tags(endpoint))
+        body, validators = fetch(validators)
+        if body is NOT_MODIFIED:
+            # Unchanged: renew the entry we already hold
+            if entry is None:
+                return None
+            self.set(key, endpoint, entry['body'], validators, tags=tags)
+            if self.snapshots:
+                self.snapshots.touch(key)
+            return entry['body']
+        if is_unavailable(body):
+            return self._last_good(key, endpoint, entry, body)
+        if body is not None:
+            self.set(key, endpoint, body, validators, tags=tags)
+            if self.snapshots:
+                self.snapshots.put(key, endpoint, body, validators)
+        return body
+
+    def _last_good(self, key, endpoint, entry, failure):
+        """Stale-if-error: the last good body for ``key`` (from memory, else a snapshot), else ``failure``"""
+        if entry is not None:
+            body, validators = entry['body'], entry.get('validators')
+        else:
+            snapshot = self.snapshots.get(key) if self.snapshots else None
+            if snapshot is None:
+                return failure
+            body, validators, _ = snapshot
+        metrics.increment('cache_served_on_error')
+        # Count it as fresh for a short while so the failing backend is not
+        # asked again on every request
+        self.set(key, endpoint, body, validators, ttl=self.snapshots.error_ttl if self.snapshots else 30)
+        return body
+
+    def warm(self):
+        """Prune expired snapshots and load recent ones into the cache in the background"""
+        if self.snapshots:
+            self._executor.submit(self._warm)
+
+    def _warm(self):
+        pruned = self.snapshots.prune()
+        if pruned:
+            logger.info("Pruned %d expired backend API snapshots", pruned)
+        if not self.snapshots.warm_on_startup:
+            return
+        loaded = 0
+        try:
+            for key, endpoint, body, validators, _ in self.snapshots.recent(self.snapshots.warm_limit):
+                if self.get(key) is None:
+                    # Stale straight away: served at once, revalidated on first use
+                    self.set(key, endpoint, body, validators, ttl=0)
+                    loaded += 1
+        except Exception:
+            logger.exception("Warming the backend API cache failed")
+        if loaded:
+            logger.info("Warmed the backend API cache with %d snapshots", loaded)
+
+    def _refresh_in_background(self, key, endpoint, fetch):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        self._executor.submit(self._refresh, key, endpoint, fetch)
+
+    def _refresh(self, key, endpoint, fetch):
+        metrics.increment('cache_refreshes')
+        try:
+            self._store(key, endpoint, self.get(key), fetch)
+        except Exception:
+            logger.exception("Background refresh of %s failed", endpoint)
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
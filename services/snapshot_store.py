@@ -0,0 +1,160 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'ENABLED': True,
+    'PATH': None,  # defaults to BASE_DIR / 'backend_snapshots.sqlite3'
+    'MAX_AGE': 7 * 86400,  # seconds a snapshot may be served or used to warm the cache
+    'ERROR_TTL': 30,  # seconds a copy served because the backend failed counts as fresh
+    'WARM_ON_STARTUP': True,
+    'WARM_LIMIT': 500,  # most recent snapshots loaded into the cache at startup
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    key TEXT PRIMARY KEY,
+    endpoint TEXT NOT NULL,
+    body TEXT NOT NULL,
+    validators TEXT,
+    stored_at REAL NOT NULL
+)
+"""
+
+
+class SnapshotStore:
+    """
+    Last successful response per response-cache key, in a SQLite file.
+
+    Unlike the in-memory cache it survives deploys and restarts, so it can
+    warm a cold cache and stand in for the backend while it is failing.
+    Errors are logged and otherwise ignored: the store only ever makes
+    things better than having no copy at all.
+    """
+
+    def __init__(self, path, max_age=7 * 86400, error_ttl=30, warm_on_startup=True, warm_limit=500):
+        self.path = str(path)
+        self.max_age = max_age
+        self.error_ttl = error_ttl
+        self.warm_on_startup = warm_on_startup
+        self.warm_limit = warm_limit
+        self._local = threading.local()
+
+    @classmethod
+    def from_settings(cls):
+        options = {**DEFAULT_SETTINGS, **getattr(settings, 'BACKEND_API_SNAPSHOTS', {})}
+        if not options['ENABLED']:
+            return None
+        return cls(
+            options['PATH'] or settings.BASE_DIR / 'backend_snapshots.sqlite3',
+            max_age=options['MAX_AGE'],
+            error_ttl=options['ERROR_TTL'],
+            warm_on_startup=options['WARM_ON_STARTUP'],
+            warm_limit=options['WARM_LIMIT'],
+        )
+
+    def _connection(self, create=True):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if not create and not os.path.exists(self.path):
+                return None
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def put(self, key, endpoint, body, validators=None):
+        try:
+            self._connection().execute(
+                'INSERT OR REPLACE INTO snapshots (key, endpoint, body, validators, stored_at) VALUES (?, ?, ?, ?, ?)',
+                (key, endpoint, json.dumps(body), json.dumps(validators) if validators else None, time.time()),
+            )
+        except (sqlite3.Error, TypeError, ValueError) as e:
+            logger.warning(f"Could not store snapshot for {endpoint}: {e}")
+
+    def touch(self, key):
+        """Mark a snapshot as confirmed current (the backend answered 304)"""
+        try:
+            self._connection().execute('UPDATE snapshots SET stored_at = ? WHERE key = ?', (time.time(), key))
+        except sqlite3.Error as e:
+            logger.warning(f"Could not update snapshot: {e}")
+
+    def get(self, key):
+        """(body, validators, stored_at) for ``key`` if a young enough snapshot exists"""
+        try:
+            conn = self._connection(create=False)
+            if conn is None:
+                return None
+            row = conn.execute(
+                'SELECT body, validators, stored_at FROM snapshots WHERE key = ? AND stored_at >= ?',
+                (key, time.time() - self.max_age),
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read snapshot: {e}")
+            return None
+        if row is None:
+            return None
+        body, validators, stored_at = row
+        return json.loads(body), json.loads(validators) if validators else None, stored_at
+
+    def recent(self, limit=500):
+        """Yield (key, endpoint, body, validators, stored_at), newest first"""
+        try:
+            conn = self._connection(create=False)
+            if conn is None:
+                return
+            rows = conn.execute(
+                'SELECT key, endpoint, body, validators, stored_at FROM snapshots '
+                'WHERE stored_at >= ? ORDER BY stored_at DESC LIMIT ?',
+                (time.time() - self.max_age, limit),
+            ).fetchall()
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read snapshots: {e}")
+            return
+        for key, endpoint, body, validators, stored_at in rows:
+            yield key, endpoint, json.loads(body), json.loads(validators) if validators else None, stored_at
+
+    def endpoints(self):
+        """Distinct endpoints that have snapshots"""
+        try:
+            conn = self._connection(create=False)
+            if conn is None:
+                return []
+            return [endpoint for endpoint, in conn.execute('SELECT DISTINCT endpoint FROM snapshots')]
+        except sqlite3.Error as e:
+            logger.warning(f"Could not read snapshots: {e}")
+            return []
+
+    def delete_endpoints(self, endpoints):
+        """Delete every snapshot of ``endpoints``; returns how many were removed"""
+        if not endpoints:
+            return 0
+        placeholders = ', '.join('?' * len(endpoints))
+        try:
+            conn = self._connection(create=False)
+            if conn is None:
+                return 0
+            return conn.execute(f'DELETE FROM snapshots WHERE endpoint IN ({placeholders})', list(endpoints)).rowcount
+        except sqlite3.Error as e:
+            logger.warning(f"Could not delete snapshots: {e}")
+            return 0
+
+    def prune(self):
+        """Delete snapshots older than max_age; returns how many were removed"""
+        try:
+            conn = self._connection(create=False)
+            if conn is None:
+                return 0
+            return conn.execute('DELETE FROM snapshots WHERE stored_at < ?', (time.time() - self.max_age,)).rowcount
+        except sqlite3.Error as e:
+            logger.warning(f"Could not prune snapshots: {e}")
+            return 0
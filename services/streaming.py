@@ -0,0 +1,98 @@
+import codecs
+import json
+
+_WHITESPACE = ' \t\n\r'
+_decoder = json.JSONDecoder()
+
+
+class _Reader:
+    """Text buffer over a stream of byte chunks, refilled on demand"""
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.pos = 0
+        self.exhausted = False
+
+    def fill(self):
+        if self.exhausted:
+            return False
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.buffer += self.utf8.decode(b'', final=True)
+            self.exhausted = True
+        else:
+            self.buffer += self.utf8.decode(chunk)
+        # Drop what has been consumed so the buffer stays about one chunk long
+        self.buffer = self.buffer[self.pos:]
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Next non-whitespace character, without consuming it ('' at the end)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos}")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number at the very end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and not self.exhausted:
+                self.fill()
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_items(chunks, key='results', meta=None):
+    """
+    Yield the items of the array under top-level ``key`` of a JSON object
+    read from ``chunks`` (an iterable of bytes), one at a time.
+
+    Only one item and about one chunk of text are held in memory, so large
+    pages can be consumed while they are still being downloaded. Other
+    top-level values are decoded and stored in ``meta`` (a dict) if given,
+    else skipped; they are complete once the generator is exhausted.
+    """
+    reader = _Reader(chunks)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        name = reader.value()
+        reader.expect(':')
+        if name == key and reader.peek() == '[':
+            reader.expect('[')
+            if reader.peek() != ']':
+                while True:
+                    yield reader.value()
+                    if reader.peek() != ',':
+                        break
+                    reader.expect(',')
+            reader.expect(']')
+        else:
+            value = reader.value()
+            if meta is not None:
+                meta[name] = value
+        if reader.peek() != ',':
+            break
+        reader.expect(',')
+    reader.expect('}')
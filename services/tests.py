@@ -0,0 +1,476 @@
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import requests
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase, override_settings
+
+from .api_client import BackendAPIClient
+from .async_api_client import AsyncBackendAPIClient, gather_with_deadline
+from .fake_backend import FakeBackend, make_token
+from .metrics import metrics
+from .progress_queue import REJECTED, RETRY, SENT, ProgressQueue
+from .resilience import BackendUnavailable, BackendUnavailableError, CircuitBreaker, RetryBudget
+from .response_cache import TAG_VERSION_KEY, ResponseCache
+from .snapshot_store import SnapshotStore
+from .streaming import iter_json_items
+from .token_store import TokenStore
+from .transport import PooledTransport
+
+
+def make_client(backend, **overrides):
+    """A client for ``backend`` with no retries and nothing kept on disk"""
+    options = {
+        'BACKEND_API_URL': backend.url,
+        'BACKEND_API_CACHE': {'ENABLED': False},
+        'BACKEND_API_SNAPSHOTS': {'ENABLED': False},
+        'BACKEND_API_PROGRESS_QUEUE': {'ENABLED': False},
+        'BACKEND_API_RESILIENCE': {'MAX_RETRIES': 0},
+        **overrides,
+    }
+    with override_settings(**options):
+        return BackendAPIClient()
+
+
+class FakeBackendTestCase(SimpleTestCase):
+    backend_options = {}
+
+    def setUp(self):
+        self.backend = FakeBackend(port=0, latency=0, **self.backend_options).start()
+        self.addCleanup(self.backend.stop)
+        self.client = make_client(self.backend)
+
+
+class CourseDetailsManyTests(FakeBackendTestCase):
+    backend_options = {'courses': 5}
+
+    def test_deduplicates_ids_and_keeps_partial_results(self):
+        self.backend.forced_statuses['/api/courses/2/quizzes/'] = 503
+        with mock.patch.object(self.client, 'get_course_detail', wraps=self.client.get_course_detail) as detail:
+            results = self.client.get_course_details_many([1, 2, 1, 99])
+        self.assertEqual(detail.call_count, 3)
+        self.assertEqual(list(results), [1, 2, 99])
+
+        self.assertEqual(results[1]['detail']['id'], 1)
+        self.assertEqual(len(results[1]['quizzes']['results']), 2)
+        self.assertEqual(results[2]['detail']['id'], 2)
+        self.assertIsInstance(results[2]['quizzes'], BackendUnavailable)
+        self.assertIsNone(results[99]['detail'])
+        self.assertEqual(len(results[99]['lessons']['results']), 5)
+
+
+class IterJsonItemsTests(SimpleTestCase):
+    def test_items_and_meta_across_chunks(self):
+        body = b'{"count": 3, "results": [{"id": 1}, {"id": 2}, {"id": 3}], "next": "?page=2"}'
+        meta = {}
+        items = list(iter_json_items([body[i:i + 7] for i in range(0, len(body), 7)], meta=meta))
+        self.assertEqual(items, [{'id': 1}, {'id': 2}, {'id': 3}])
+        self.assertEqual(meta, {'count': 3, 'next': '?page=2'})
+
+
+class IterCoursesTests(FakeBackendTestCase):
+    backend_options = {'courses': 250, 'max_page_size': 50}
+
+    def test_follows_next_when_backend_caps_page_size(self):
+        ids = [course['id'] for course in self.client.iter_courses(page_size=100)]
+        self.assertEqual(ids, list(range(1, 251)))
+
+    def test_client_error_raises_instead_of_ending(self):
+        self.backend.forced_statuses['/api/courses/'] = 429
+        with self.assertRaises(BackendUnavailableError):
+            list(self.client.iter_courses(page_size=100))
+
+    def test_server_error_raises(self):
+        self.backend.forced_statuses['/api/courses/'] = 503
+        with self.assertRaises(BackendUnavailableError):
+            list(self.client.iter_courses(page_size=100))
+
+
+class ResponseCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = ResponseCache(backend=LocMemCache('response-cache-tests', {}), refresh_workers=1)
+        self.cache.backend.clear()
+        self.addCleanup(self.cache._executor.shutdown)
+        self.fetches = 0
+
+    def fetch(self, validators):
+        self.fetches += 1
+        return {'id': 1, 'fetch': self.fetches}, {}
+
+    def get_course(self):
+        return self.cache.get_or_fetch('course-1', '/api/courses/1/', self.fetch)
+
+    def test_purge_invalidates_tagged_entries(self):
+        self.assertEqual(self.get_course()['fetch'], 1)
+        self.assertEqual(self.get_course()['fetch'], 1)
+        self.cache.purge_tags(['course:1'])
+        self.assertEqual(self.get_course()['fetch'], 2)
+
+    def test_evicted_version_key_is_a_miss(self):
+        self.get_course()
+        self.cache.purge_tags(['course:1'])
+        self.get_course()
+        self.cache.backend.delete(TAG_VERSION_KEY.format('course:1'))
+        self.assertIsNone(self.cache.get('course-1'))
+        self.assertEqual(self.get_course()['fetch'], 3)
+
+        # A purge recreating the key must not revive entries from before
+        stale = self.cache.backend.get('course-1')
+        self.cache.backend.delete(TAG_VERSION_KEY.format('course:1'))
+        self.cache.purge_tags(['course:1'])
+        self.cache.backend.set('course-1', stale)
+        self.assertIsNone(self.cache.get('course-1'))
+
+    def test_concurrent_misses_share_one_fetch(self):
+        started = threading.Barrier(8)
+
+        def fetch(validators):
+            time.sleep(0.2)
+            return self.fetch(validators)
+
+        def get_course():
+            started.wait()
+            return self.cache.get_or_fetch('course-1', '/api/courses/1/', fetch)
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = [future.result() for future in [executor.submit(get_course) for _ in range(8)]]
+        self.assertEqual(self.fetches, 1)
+        self.assertEqual(results, [{'id': 1, 'fetch': 1}] * 8)
+
+    def test_waits_for_the_entry_of_the_process_holding_the_lock(self):
+        self.cache.backend.add('course-1:lock', 'other process', timeout=10)
+        filler = threading.Timer(0.2, self.cache.set, ['course-1', '/api/courses/1/', {'id': 1, 'fetch': 0}])
+        filler.start()
+        self.addCleanup(filler.cancel)
+
+        self.assertEqual(self.get_course(), {'id': 1, 'fetch': 0})
+        self.assertEqual(self.fetches, 0)
+
+    def test_purge_during_fetch_invalidates_the_stored_entry(self):
+        def fetch(validators):
+            self.cache.purge_tags(['course:1'])
+            return {'id': 1}, {}
+
+        self.cache.get_or_fetch('course-1', '/api/courses/1/', fetch)
+        self.assertIsNone(self.cache.get('course-1'))
+
+
+class TokenStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.refreshes = []
+        self.store = TokenStore(self.refresh, backend=LocMemCache('token-store-tests', {}), refresh_margin=60,
+                                refresh_workers=1)
+        self.store.backend.clear()
+        self.addCleanup(self.store._executor.shutdown)
+
+    def refresh(self, refresh_token):
+        time.sleep(0.1)
+        self.refreshes.append(refresh_token)
+        return {'access': make_token('access', 300)}
+
+    def test_refreshes_in_the_background_inside_the_margin(self):
+        expiring = make_token('access', 30)
+        self.store.save(1, expiring, make_token('refresh', 3600))
+
+        self.assertEqual(self.store.get_access_token(1), expiring)
+        self.store._executor.submit(lambda: None).result()  # wait for the queued refresh
+        self.assertEqual(len(self.refreshes), 1)
+        self.assertNotEqual(self.store.get_access_token(1), expiring)
+
+    def test_concurrent_rejections_share_one_refresh(self):
+        rejected = make_token('access', 300)
+        self.store.save(1, rejected, make_token('refresh', 3600))
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            tokens = list(executor.map(lambda _: self.store.refresh(1, rejected=rejected), range(8)))
+        self.assertEqual(len(self.refreshes), 1)
+        self.assertEqual(len(set(tokens)), 1)
+        self.assertNotEqual(tokens[0], rejected)
+
+        # A later 401 for the token already replaced does not refresh again
+        self.assertEqual(self.store.refresh(1, rejected=rejected), tokens[0])
+        self.assertEqual(len(self.refreshes), 1)
+
+    def test_tokens_are_kept_per_user(self):
+        self.store.save(1, 'token-1', 'refresh-1')
+        self.store.save(2, 'token-2', 'refresh-2')
+        self.assertEqual(self.store.get_access_token(1), 'token-1')
+        self.assertEqual(self.store.get_access_token(2), 'token-2')
+        self.assertIsNone(self.store.get_access_token(3))
+
+        self.store.clear(1)
+        self.assertIsNone(self.store.get_access_token(1))
+        self.assertEqual(self.store.get_access_token(2), 'token-2')
+
+
+class ConditionalRevalidationTests(FakeBackendTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        # Entries go stale at once but keep their ETag for revalidation
+        self.client = make_client(self.backend, BACKEND_API_CACHE={'ENABLED': True, 'TTLS': {'*': 0}, 'STALE_TTL': 0})
+
+    def test_not_modified_renews_the_entry_without_reading_a_body(self):
+        course = self.client.get_course_detail(1)
+        revalidated = metrics.snapshot()['counters'].get('cache_revalidated', 0)
+
+        with mock.patch.object(requests.Response, 'json', side_effect=AssertionError('body was read')):
+            self.assertEqual(self.client.get_course_detail(1), course)
+        self.assertEqual(metrics.snapshot()['counters']['cache_revalidated'], revalidated + 1)
+
+
+class SlowClient:
+    def get_course_detail(self, course_id):
+        time.sleep(0.3)
+        return {'id': course_id}
+
+    def get_course_lessons(self, course_id):
+        time.sleep(2)
+        return {'results': []}
+
+
+class GatherWithDeadlineTests(SimpleTestCase):
+    def setUp(self):
+        self.client = AsyncBackendAPIClient(client=SlowClient(), max_workers=4)
+        self.addCleanup(self.client._executor.shutdown, wait=False)
+
+    async def test_calls_run_concurrently(self):
+        started = time.monotonic()
+        results = await gather_with_deadline(
+            self.client.get_course_detail(1), self.client.get_course_detail(2), deadline=5,
+        )
+        self.assertEqual(results, [{'id': 1}, {'id': 2}])
+        self.assertLess(time.monotonic() - started, 0.55)
+
+    async def test_call_past_the_deadline_becomes_unavailable(self):
+        started = time.monotonic()
+        lessons, course = await gather_with_deadline(
+            self.client.get_course_lessons(1), self.client.get_course_detail(1), deadline=0.5,
+        )
+        self.assertIsInstance(lessons, BackendUnavailable)
+        self.assertEqual(course, {'id': 1})
+        self.assertLess(time.monotonic() - started, 1)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def make_breaker(self):
+        return CircuitBreaker(window=30, min_requests=2, error_rate=0.5, reset_timeout=0)
+
+    def test_opens_on_error_rate_and_probes_once(self):
+        breaker = self.make_breaker()
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        self.assertTrue(breaker.allow_request())
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertFalse(breaker.allow_request())
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        self.assertTrue(breaker.allow_request())
+
+    def test_failed_probe_reopens(self):
+        breaker = self.make_breaker()
+        breaker.record_failure()
+        breaker.record_failure()
+        breaker.allow_request()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_released_probe_lets_the_next_one_through(self):
+        breaker = self.make_breaker()
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertTrue(breaker.allow_request())
+        breaker.release_probe()
+        self.assertTrue(breaker.allow_request())
+
+
+class RetryBudgetTests(SimpleTestCase):
+    def test_retries_are_capped_at_a_fraction_of_requests(self):
+        budget = RetryBudget(ratio=0.5, min_per_second=0)
+        while budget.try_spend():
+            pass
+        self.assertFalse(budget.try_spend())
+
+        for _ in range(4):
+            budget.record_request()
+        self.assertTrue(budget.try_spend())
+        self.assertTrue(budget.try_spend())
+        self.assertFalse(budget.try_spend())
+
+
+class SendCircuitBreakerTests(FakeBackendTestCase):
+    def open_circuit(self):
+        breaker = self.client.circuit_breaker
+        breaker.reset_timeout = 0
+        breaker.min_requests = 1
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+    def test_probe_failing_with_a_request_error_does_not_stick_half_open(self):
+        self.open_circuit()
+        with mock.patch.object(self.client.transport, 'request',
+                               side_effect=requests.exceptions.TooManyRedirects('loop')):
+            self.assertIsNone(self.client.get_course_detail(1))
+        self.assertEqual(self.client.circuit_breaker.state, CircuitBreaker.OPEN)
+
+        # The next probe goes through and closes the circuit
+        self.assertEqual(self.client.get_course_detail(1)['id'], 1)
+        self.assertEqual(self.client.circuit_breaker.state, CircuitBreaker.CLOSED)
+
+    def test_probe_failing_unexpectedly_is_released(self):
+        self.open_circuit()
+        with mock.patch.object(self.client.transport, 'request', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                self.client.get_course_detail(1)
+        self.assertEqual(self.client.get_course_detail(1)['id'], 1)
+
+
+class ProgressQueueTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'progress.sqlite3')
+        self.outcomes = {}
+        self.sent = []
+        self.queue = self.make_queue()
+
+    def make_queue(self):
+        queue = ProgressQueue(self.path, self.send, batch_size=100, flush_interval=3600, max_attempts=3,
+                              backoff_base=0, backoff_cap=0)
+        self.addCleanup(queue.shutdown)
+        return queue
+
+    def send(self, user_id, data):
+        self.sent.append((user_id, data))
+        return self.outcomes.get(data['course'], SENT)
+
+    def test_keeps_only_the_latest_update_per_user_and_course(self):
+        for progress in range(10):
+            self.queue.add(1, {'course': 5, 'progress': progress})
+        self.queue.add(2, {'course': 5, 'progress': 50})
+        self.queue.add(1, {'course': 6, 'progress': 60})
+        self.assertEqual(self.queue.pending(), 3)
+
+        self.assertEqual(self.queue.flush(), 3)
+        self.assertCountEqual(self.sent, [
+            (1, {'course': 5, 'progress': 9}), (2, {'course': 5, 'progress': 50}), (1, {'course': 6, 'progress': 60}),
+        ])
+        self.assertEqual(self.queue.pending(), 0)
+
+    def test_updates_without_a_course_are_not_queued(self):
+        self.assertFalse(self.queue.add(1, {'progress': 10}))
+        self.assertEqual(self.queue.pending(), 0)
+
+    def test_transient_failures_are_retried_until_max_attempts(self):
+        self.outcomes[5] = RETRY
+        self.queue.add(1, {'course': 5, 'progress': 10})
+        for _ in range(2):
+            self.queue.flush()
+            self.assertEqual(self.queue.pending(), 1)
+        self.queue.flush()
+        self.assertEqual(len(self.sent), 3)
+        self.assertEqual(self.queue.pending(), 0)
+
+    def test_rejected_updates_are_dropped_at_once(self):
+        self.outcomes[5] = REJECTED
+        self.queue.add(1, {'course': 5, 'progress': 10})
+        self.queue.flush()
+        self.assertEqual(len(self.sent), 1)
+        self.assertEqual(self.queue.pending(), 0)
+
+    def test_survives_a_restart(self):
+        self.queue.add(1, {'course': 5, 'progress': 10})
+        self.queue.shutdown()
+
+        restarted = self.make_queue()
+        self.assertEqual(restarted.flush(), 1)
+        self.assertEqual(self.sent, [(1, {'course': 5, 'progress': 10})])
+
+
+class SendProgressTests(FakeBackendTestCase):
+    def test_classifies_backend_answers(self):
+        self.assertEqual(self.client._send_progress(None, {'course': 1}), RETRY)  # 401: no tokens yet
+
+        self.client.authenticate('alice', 'pw')
+        self.assertEqual(self.client._send_progress(None, {'course': 1, 'progress': 10}), SENT)
+        self.assertEqual(self.backend.progress, [{'course': 1, 'progress': 10}])
+
+        self.backend.forced_statuses['/api/progress/'] = 400
+        self.assertEqual(self.client._send_progress(None, {'course': 1}), REJECTED)
+        self.backend.forced_statuses['/api/progress/'] = 429
+        self.assertEqual(self.client._send_progress(None, {'course': 1}), RETRY)
+        self.backend.forced_statuses['/api/progress/'] = 503
+        self.assertEqual(self.client._send_progress(None, {'course': 1}), RETRY)
+
+
+class SnapshotStoreTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'snapshots.sqlite3')
+        self.store = SnapshotStore(self.path, max_age=60)
+
+    def test_put_get_and_delete_by_endpoint(self):
+        self.store.put('a', '/api/courses/1/', {'id': 1}, {'etag': '"x"'})
+        self.store.put('b', '/api/courses/2/', {'id': 2})
+        self.assertEqual(self.store.get('a')[:2], ({'id': 1}, {'etag': '"x"'}))
+
+        self.assertEqual(self.store.delete_endpoints(['/api/courses/1/']), 1)
+        self.assertIsNone(self.store.get('a'))
+        self.assertIsNotNone(self.store.get('b'))
+
+    def test_warming_the_cache_prunes_expired_snapshots(self):
+        self.store.put('old', '/api/courses/1/', {'id': 1})
+        self.store._connection().execute('UPDATE snapshots SET stored_at = 0')
+        self.store.put('new', '/api/courses/2/', {'id': 2})
+
+        cache = ResponseCache(backend=LocMemCache('snapshot-warm-tests', {}), refresh_workers=1, snapshots=self.store)
+        cache.warm()
+        cache._executor.shutdown(wait=True)
+        self.assertEqual(self.store._connection().execute('SELECT key FROM snapshots').fetchall(), [('new',)])
+        self.assertEqual(cache.get('new')['body'], {'id': 2})
+
+    def test_errors_are_logged_not_raised(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not a database' * 100)
+        with self.assertLogs('services.snapshot_store', 'WARNING'):
+            self.assertIsNone(self.store.get('a'))
+        self.assertEqual(self.store.delete_endpoints(['/api/courses/1/']), 0)
+        self.assertEqual(self.store.prune(), 0)
+
+
+class PooledTransportTests(SimpleTestCase):
+    def setUp(self):
+        self.backend = FakeBackend(port=0, latency=0).start()
+        self.addCleanup(self.backend.stop)
+        self.transport = PooledTransport(pool_maxsize=5)
+        self.addCleanup(self.transport.close)
+        self.host = self.backend.url.split('//')[1]
+
+    def test_idle_connections_counts_real_sockets(self):
+        self.transport.request('GET', f'{self.backend.url}/api/courses/1/')
+        stats = self.transport.pool_stats()[self.host]
+        self.assertEqual(stats['idle_connections'], 1)
+        self.assertEqual(stats['in_flight'], 0)
+
+    def test_cookies_set_by_the_backend_are_not_sent_back(self):
+        self.transport.request('POST', f'{self.backend.url}/api/token/', json={})
+        self.transport.request('GET', f'{self.backend.url}/api/courses/1/')
+        self.assertEqual(self.backend.received_cookies, [])
+
+    def test_streamed_response_is_in_flight_until_closed(self):
+        response = self.transport.request('GET', f'{self.backend.url}/api/courses/1/', stream=True)
+        self.assertEqual(self.transport.pool_stats()[self.host]['in_flight'], 1)
+        with response:
+            response.json()
+        self.assertEqual(self.transport.pool_stats()[self.host]['in_flight'], 0)
+        response.close()
+        self.assertEqual(self.transport.pool_stats()[self.host]['in_flight'], 0)
@@ -0,0 +1,145 @@
+import base64
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SETTINGS = {
+    'ACCESS_LIFETIME': 3600,  # seconds, used when the token carries no exp claim
+    'REFRESH_LIFETIME': 86400,
+    'REFRESH_MARGIN': 60,  # refresh in the background this long before expiry
+    'REFRESH_WORKERS': 2,
+}
+
+
+def token_expiry(token, default_lifetime):
+    """Expiry timestamp from a JWT's exp claim, else now + ``default_lifetime``"""
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))['exp'])
+    except (AttributeError, IndexError, KeyError, TypeError, ValueError):
+        return time.time() + default_lifetime
+
+
+class TokenStore:
+    """
+    Backend API tokens for each Django user, stored in the cache with their
+    expiry.
+
+    Reading a token never waits on the backend while it is valid: once it is
+    within REFRESH_MARGIN of expiry, one background refresh replaces it.
+    Only an expired or rejected token is refreshed inline, and concurrent
+    refreshes for the same user share one request.
+    """
+
+    def __init__(self, refresh_func, backend=None, access_lifetime=3600, refresh_lifetime=86400,
+                 refresh_margin=60, refresh_workers=2):
+        # refresh_func(refresh_token) returns the backend's token response or None
+        self.refresh_func = refresh_func
+        self.backend = backend or cache
+        self.access_lifetime = access_lifetime
+        self.refresh_lifetime = refresh_lifetime
+        self.refresh_margin = refresh_margin
+        self.singleflight = SingleFlight()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix='backend-api-token')
+
+    @classmethod
+    def from_settings(cls, refresh_func):
+        options = {**DEFAULT_SETTINGS, **getattr(settings, 'BACKEND_API_TOKENS', {})}
+        return cls(
+            refresh_func,
+            access_lifetime=options['ACCESS_LIFETIME'],
+            refresh_lifetime=options['REFRESH_LIFETIME'],
+            refresh_margin=options['REFRESH_MARGIN'],
+            refresh_workers=options['REFRESH_WORKERS'],
+        )
+
+    @staticmethod
+    def _key(user_id):
+        # Requests made without a user share the service-wide credentials
+        return f"backend_api_tokens:{user_id if user_id is not None else 'default'}"
+
+    def save(self, user_id, access, refresh=None):
+        previous = self.backend.get(self._key(user_id)) or {}
+        if refresh is None:
+            refresh = previous.get('refresh')
+            refresh_expires = previous.get('refresh_expires', 0)
+        else:
+            refresh_expires = token_expiry(refresh, self.refresh_lifetime)
+        tokens = {
+            'access': access,
+            'expires': token_expiry(access, self.access_lifetime),
+            'refresh': refresh,
+            'refresh_expires': refresh_expires,
+        }
+        timeout = max(tokens['expires'], refresh_expires) - time.time()
+        self.backend.set(self._key(user_id), tokens, timeout=max(int(timeout), 1))
+        return tokens
+
+    def clear(self, user_id):
+        self.backend.delete(self._key(user_id))
+
+    def get_access_token(self, user_id=None):
+        """A valid access token for the user, or None if they have no credentials"""
+        tokens = self.backend.get(self._key(user_id))
+        if tokens is None:
+            return None
+        remaining = tokens['expires'] - time.time()
+        if remaining > self.refresh_margin:
+            return tokens['access']
+        if remaining > 0:
+            self._refresh_in_background(user_id)
+            return tokens['access']
+        return self.refresh(user_id)
+
+    def refresh(self, user_id=None, rejected=None):
+        """
+        Refresh the user's access token and return the new one (None on failure).
+
+        ``rejected`` is a token the backend refused; if another thread has
+        already replaced it, the newer token is returned without a request.
+        """
+        return self.singleflight.do(self._key(user_id), lambda: self._refresh(user_id, rejected))
+
+    def _refresh(self, user_id, rejected):
+        tokens = self.backend.get(self._key(user_id))
+        if tokens is None or not tokens.get('refresh'):
+            return None
+        if tokens['access'] != rejected and tokens['expires'] - time.time() > self.refresh_margin:
+            # Someone refreshed while we waited
+            return tokens['access']
+        if tokens['refresh_expires'] <= time.time():
+            self.clear(user_id)
+            return None
+
+        response = self.refresh_func(tokens['refresh'])
+        if not response or 'access' not in response:
+            return None
+        return self.save(user_id, response['access'], response.get('refresh'))['access']
+
+    def _refresh_in_background(self, user_id):
+        with self._lock:
+            if user_id in self._refreshing:
+                return
+            self._refreshing.add(user_id)
+        self._executor.submit(self._background_refresh, user_id)
+
+    def _background_refresh(self, user_id):
+        try:
+            self.refresh(user_id)
+        except Exception:
+            logger.exception("Background token refresh for user %s failed", user_id)
+        finally:
+            with self._lock:
+                self._refreshing.discard(user_id)
@@ -0,0 +1,170 @@
+import http.cookiejar
+import socket
+import threading
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+
+DEFAULT_SETTINGS = {
+    'POOL_CONNECTIONS': 4,  # hosts whose pools are kept per session
+    'POOL_MAXSIZE': 20,  # connections per host; size it to the worker thread count
+    'POOL_BLOCK': True,  # wait for a free connection instead of opening throwaway ones
+    'TCP_KEEPALIVE': True,
+}
+
+DEFAULT_HEADERS = {
+    'Content-Type': 'application/json',
+    'Connection': 'keep-alive',
+}
+
+
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter that turns on TCP keep-alive for pooled connections"""
+
+    def __init__(self, *args, tcp_keepalive=True, **kwargs):
+        self.tcp_keepalive = tcp_keepalive
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        if self.tcp_keepalive:
+            kwargs['socket_options'] = HTTPConnection.default_socket_options + [
+                (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+            ]
+        super().init_poolmanager(*args, **kwargs)
+
+
+class PooledTransport:
+    """
+    Thread-safe HTTP transport with one sized connection pool per backend host.
+
+    Sessions are only configured when created; per-request data such as the
+    Authorization header is passed with each call, so threads never race on
+    shared session state.
+    """
+
+    def __init__(self, pool_connections=4, pool_maxsize=20, pool_block=True, tcp_keepalive=True):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.tcp_keepalive = tcp_keepalive
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._in_flight = defaultdict(int)
+        self._peak_in_flight = defaultdict(int)
+        self._saturated = defaultdict(int)
+        self._requests = defaultdict(int)
+
+    @classmethod
+    def from_settings(cls):
+        options = {**DEFAULT_SETTINGS, **getattr(settings, 'BACKEND_API_POOL', {})}
+        return cls(
+            pool_connections=options['POOL_CONNECTIONS'],
+            pool_maxsize=options['POOL_MAXSIZE'],
+            pool_block=options['POOL_BLOCK'],
+            tcp_keepalive=options['TCP_KEEPALIVE'],
+        )
+
+    def _session_for(self, host):
+        session = self._sessions.get(host)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(host)
+                if session is None:
+                    session = requests.Session()
+                    session.headers.update(DEFAULT_HEADERS)
+                    # The session is shared by every user, so cookies one
+                    # response sets must never be sent with another's request
+                    session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+                    adapter = KeepAliveAdapter(
+                        pool_connections=self.pool_connections,
+                        pool_maxsize=self.pool_maxsize,
+                        pool_block=self.pool_block,
+                        tcp_keepalive=self.tcp_keepalive,
+                    )
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._sessions[host] = session
+        return session
+
+    def request(self, method, url, headers=None, **kwargs):
+        """Send a request; ``headers`` apply to this call only"""
+        host = urlsplit(url).netloc
+        session = self._session_for(host)
+
+        with self._lock:
+            self._requests[host] += 1
+            if self._in_flight[host] >= self.pool_maxsize:
+                # Every pooled connection is busy: this call waits (or, with
+                # POOL_BLOCK off, opens a connection that is thrown away)
+                self._saturated[host] += 1
+            self._in_flight[host] += 1
+            self._peak_in_flight[host] = max(self._peak_in_flight[host], self._in_flight[host])
+
+        try:
+            response = session.request(method, url, headers=headers, **kwargs)
+        except BaseException:
+            self._release(host)
+            raise
+        if not kwargs.get('stream'):
+            self._release(host)
+            return response
+
+        # A streamed body is still being read, so the call stays in flight
+        # (holding its connection) until the response is closed
+        close = response.close
+        released = False
+
+        def close_and_release():
+            nonlocal released
+            close()
+            if not released:
+                released = True
+                self._release(host)
+
+        response.close = close_and_release
+        return response
+
+    def _release(self, host):
+        with self._lock:
+            self._in_flight[host] -= 1
+
+    def pool_stats(self):
+        """Per-host pool usage, including how often the pool was saturated"""
+        with self._lock:
+            hosts = list(self._sessions)
+            stats = {
+                host: {
+                    'pool_maxsize': self.pool_maxsize,
+                    'requests': self._requests[host],
+                    'in_flight': self._in_flight[host],
+                    'peak_in_flight': self._peak_in_flight[host],
+                    'saturated_requests': self._saturated[host],
+                }
+                for host in hosts
+            }
+        for host in hosts:
+            adapter = self._sessions[host].get_adapter(f'http://{host}')
+            pools = adapter.poolmanager.pools
+            stats[host]['idle_connections'] = sum(
+                self._idle_connections(pools[key]) for key in pools.keys()
+            )
+        return stats
+
+    @staticmethod
+    def _idle_connections(pool):
+        # urllib3 pre-fills the pool's queue with None placeholders up to
+        # maxsize; only the entries holding a connection are real sockets
+        if pool.pool is None:
+            return 0
+        with pool.pool.mutex:
+            return sum(1 for conn in pool.pool.queue if conn is not None)
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            session.close()
@@ -5,11 +5,21 @@ class ActivityFeed {
         this.markAllReadBtn = document.getElementById('mark-all-read');
         this.loadMoreBtn = document.getElementById('load-more-activities');
         this.currentFilter = 'all';
-        this.page = 1;
+        this.cursor = null;
         this.isLoading = false;
         
+        this.eventSource = null;
+        this.pollTimer = null;
+        this.pollInterval = 30000;
+        
+        // Mark-as-read clicks are coalesced and sent in debounced batches
+        this.pendingReads = new Map();
+        this.readFlushTimer = null;
+        this.readFlushDelay = 400;
+        
         this.initializeEventListeners();
         this.loadActivities();
+        this.connectStream();
     }
     
     initializeEventListeners() {
@@ -19,7 +29,7 @@ class ActivityFeed {
                 e.preventDefault();
                 const filter = btn.dataset.activityFilter;
                 this.setActiveFilter(btn, filter);
-                this.page = 1;
+                this.cursor = null;
                 this.loadActivities();
             });
         });
@@ -34,6 +44,9 @@ class ActivityFeed {
             this.loadMoreBtn.addEventListener('click', () => this.loadMoreActivities());
         }
         
+        // Send any queued mark-as-read clicks before the page goes away
+        window.addEventListener('pagehide', () => this.flushPendingReads(true));
+        
         // Mark as read on click
         document.addEventListener('click', (e) => {
             const markReadBtn = e.target.closest('.mark-as-read');
@@ -45,6 +58,53 @@ class ActivityFeed {
         });
     }
     
+    connectStream() {
+        // New activities are pushed over SSE instead of re-fetching the feed.
+        // EventSource reconnects on its own and sends Last-Event-ID so the
+        // server can replay anything missed while disconnected. Streams are
+        // only served under ASGI, so a page mounting the feed opts in with
+        // data-activity-stream="true" on #activities-container (when
+        // ACTIVITY_STREAM_ENABLED is set); otherwise poll.
+        if (!window.EventSource || this.activitiesContainer.dataset.activityStream !== 'true') {
+            this.startPolling();
+            return;
+        }
+        
+        this.eventSource = new EventSource('/api/activities/stream/');
+        this.eventSource.addEventListener('activity', (e) => {
+            this.handleStreamedActivity(JSON.parse(e.data));
+        });
+    }
+    
+    startPolling() {
+        // The feed answers unchanged polls with 304 (see activities_etag)
+        this.pollTimer = setInterval(() => this.pollActivities(), this.pollInterval);
+    }
+    
+    async pollActivities() {
+        if (document.hidden || this.isLoading) return;
+        
+        try {
+            const params = new URLSearchParams({ type: this.currentFilter });
+            const response = await fetch(`/api/activities/?${params}`);
+            if (!response.ok) return;
+            const data = await response.json();
+            // Oldest first, so each prepend leaves the newest on top
+            data.activities.slice().reverse().forEach(activity => this.handleStreamedActivity(activity));
+        } catch (error) {
+            console.error('Error polling activities:', error);
+        }
+    }
+    
+    handleStreamedActivity(activity) {
+        if (this.currentFilter !== 'all' && activity.type !== this.currentFilter) return;
+        if (this.activitiesContainer.querySelector(`.activity-item[data-activity-id="${activity.id}"]`)) return;
+        
+        this.hideEmptyState();
+        this.activitiesContainer.prepend(this.createActivityElement(activity));
+        this.updateUnreadCount();
+    }
+    
     setActiveFilter(activeBtn, filter) {
         this.filterButtons.forEach(btn => btn.classList.remove('bg-indigo-100', 'text-indigo-800'));
         activeBtn.classList.add('bg-indigo-100', 'text-indigo-800');
@@ -57,21 +117,29 @@ class ActivityFeed {
         this.isLoading = true;
         this.toggleLoading(true);
         
+        const isFirstPage = this.cursor === null;
+        
         try {
-            const response = await fetch(`/api/activities/?type=${this.currentFilter}&page=${this.page}`);
+            const params = new URLSearchParams({ type: this.currentFilter });
+            if (!isFirstPage) {
+                params.set('cursor', this.cursor);
+            }
+            const response = await fetch(`/api/activities/?${params}`);
             const data = await response.json();
             
-            if (this.page === 1) {
+            if (isFirstPage) {
                 this.activitiesContainer.innerHTML = '';
             }
             
-            if (data.activities.length === 0 && this.page === 1) {
+            if (data.activities.length === 0 && isFirstPage) {
                 this.showEmptyState();
             } else {
                 this.hideEmptyState();
-                this.renderActivities(data.activities);
+                this.renderActivities(data.activities, isFirstPage);
             }
             
+            // The server hands back an opaque cursor for the next page
+            this.cursor = data.next;
             this.toggleLoadMoreButton(data.has_more);
         } catch (error) {
             console.error('Error loading activities:', error);
@@ -82,7 +150,7 @@ class ActivityFeed {
         }
     }
     
-    renderActivities(activities) {
+    renderActivities(activities, replace = false) {
         if (activities.length === 0) return;
         
         const fragment = document.createDocumentFragment();
@@ -92,7 +160,7 @@ class ActivityFeed {
             fragment.appendChild(activityEl);
         });
         
-        if (this.page === 1) {
+        if (replace) {
             this.activitiesContainer.innerHTML = '';
         }
         
@@ -287,22 +355,42 @@ class ActivityFeed {
         return 'Just now';
     }
     
-    async markAsRead(activityId, activityElement) {
+    markAsRead(activityId, activityElement) {
+        this.pendingReads.set(Number(activityId), activityElement);
+        
+        clearTimeout(this.readFlushTimer);
+        this.readFlushTimer = setTimeout(() => this.flushPendingReads(), this.readFlushDelay);
+    }
+    
+    async flushPendingReads(keepalive = false) {
+        clearTimeout(this.readFlushTimer);
+        this.readFlushTimer = null;
+        if (this.pendingReads.size === 0) return;
+        
+        const batch = this.pendingReads;
+        this.pendingReads = new Map();
+        
         try {
-            const response = await fetch(`/api/activities/mark-read/${activityId}/`, {
+            const response = await fetch('/api/activities/mark-read/', {
                 method: 'POST',
+                keepalive,
                 headers: {
                     'X-CSRFToken': this.getCookie('csrftoken'),
                     'Content-Type': 'application/json',
                 },
+                body: JSON.stringify({ ids: Array.from(batch.keys()) }),
             });
             
             if (response.ok) {
-                activityElement.classList.remove('bg-blue-50');
+                batch.forEach(activityElement => {
+                    if (activityElement) {
+                        activityElement.classList.remove('bg-blue-50');
+                    }
+                });
                 this.updateUnreadCount();
             }
         } catch (error) {
-            console.error('Error marking activity as read:', error);
+            console.error('Error marking activities as read:', error);
         }
     }
     
@@ -328,21 +416,34 @@ class ActivityFeed {
     }
     
     loadMoreActivities() {
-        this.page++;
+        if (!this.cursor) return;
         this.loadActivities();
     }
     
-    updateUnreadCount() {
-        const unreadCount = document.querySelectorAll('.activity-item:not(.bg-blue-50)').length;
+    async updateUnreadCount() {
         const countBadge = document.getElementById('unread-count');
+        if (!countBadge) return;
         
-        if (countBadge) {
-            if (unreadCount > 0) {
-                countBadge.textContent = unreadCount;
-                countBadge.classList.remove('hidden');
-            } else {
-                countBadge.classList.add('hidden');
-            }
+        let unreadCount;
+        try {
+            const response = await fetch('/api/activities/unread-count/');
+            unreadCount = (await response.json()).unread_count;
+        } catch (error) {
+            console.error('Error loading unread count:', error);
+            return;
+        }
+        
+        if (unreadCount > 0) {
+            countBadge.textContent = unreadCount;
+            countBadge.classList.remove('hidden');
+        } else {
+            countBadge.classList.add('hidden');
+        }
+    }
+    
+    toggleLoadMoreButton(hasMore) {
+        if (this.loadMoreBtn) {
+            this.loadMoreBtn.classList.toggle('hidden', !hasMore);
         }
     }
     
@@ -13,4 +13,8 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "techforge.settings")
 
+# Serve with an ASGI server (e.g. uvicorn or daphne) so the async views, such
+# as the /api/activities/stream/ SSE endpoint and the dashboard and
+# recommendations pages that fan out backend calls concurrently, run on the
+# event loop instead of tying up a worker thread per open connection.
 application = get_asgi_application()
@@ -144,7 +144,10 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 # Backend API Configuration
 BACKEND_API_URL = os.getenv('BACKEND_API_URL', 'http://127.0.0.1:8000')
 
-# Cache configuration for API tokens
+# Cache configuration for API tokens. LocMemCache is per-process: with more
+# than one worker, use a shared backend such as Redis or Memcached, or response
+# cache purges and fill locks (services.response_cache), backend webhooks,
+# backend tokens and published metrics only reach the process that made them.
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
@@ -174,3 +177,118 @@ LOGGING = {
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+# Buffered activity tracking: page views are queued in memory and written
+# with bulk_create by a background thread (see core.activity_buffer)
+ACTIVITY_BUFFER = {
+    'ENABLED': True,
+    'MAX_QUEUE_SIZE': 10000,
+    'BATCH_SIZE': 500,
+    'FLUSH_INTERVAL': 2.0,  # seconds
+    'HIGH_WATER_MARK': 0.8,
+    'OVERLOAD_SAMPLE_RATE': 0.1,
+}
+
+# Monthly archive partitions for user activity (see core.partitions).
+# Run `manage.py rotate_activity_partitions` daily to archive and prune.
+ACTIVITY_PARTITIONS = {
+    'HOT_MONTHS': 2,
+    'RETENTION_MONTHS': 12,
+}
+
+# Fold new activity into the daily rollups after each buffer flush (see core.rollups)
+ACTIVITY_ROLLUPS_REFRESH_ON_FLUSH = True
+
+# Seconds `manage.py backfill_activity_rollups` looks back to recount activity
+# committed out of id order; it recounts at most this often, so run it from cron
+ACTIVITY_ROLLUPS_OVERLAP = 300
+
+# Server-Sent Events for the activity feed (see core.activity_stream). Each
+# open stream holds a worker under WSGI, so only enable this when serving
+# through ASGI (techforge/asgi.py); otherwise the feed polls.
+ACTIVITY_STREAM_ENABLED = False
+ACTIVITY_STREAM_MAX_LIFETIME = 300  # seconds before a stream closes and the browser reconnects
+
+# Response cache for services.api_client (see services.response_cache)
+BACKEND_API_CACHE = {
+    'ENABLED': True,
+    'DEFAULT_TTL': 60,  # seconds
+    'STALE_TTL': 300,  # serve stale for this long while one background refresh runs
+    'REVALIDATE_TTL': 3600,  # keep entries with an ETag/Last-Modified this much longer for 304s
+    'TTLS': {
+        'courses/': 300,
+        'courses/*/lessons/': 600,
+        'courses/*/quizzes/': 600,
+        'courses/*/': 600,
+        'lessons/*/': 600,
+        'quizzes/*/': 600,
+    },
+}
+
+# Timeouts, retry budget and circuit breaker for services.api_client
+# (see services.resilience)
+BACKEND_API_RESILIENCE = {
+    'TIMEOUTS': {
+        'token/*': (3.05, 5),  # (connect, read) seconds
+        'progress/': (3.05, 5),
+        'DEFAULT': (3.05, 10),
+    },
+    'MAX_RETRIES': 2,
+    'RETRY_BUDGET_RATIO': 0.2,
+    'BREAKER_ERROR_RATE': 0.5,
+    'BREAKER_RESET_TIMEOUT': 15,  # seconds
+    'PAGE_DEADLINE': 8,  # seconds async views wait for their concurrent backend calls
+}
+
+# Connection pool for services.api_client (see services.transport); size
+# POOL_MAXSIZE to the number of threads that call the backend concurrently
+BACKEND_API_POOL = {
+    'POOL_MAXSIZE': 20,  # connections per backend host
+    'POOL_BLOCK': True,  # wait for a free connection when all are busy
+    'TCP_KEEPALIVE': True,
+}
+
+# Worker threads for bulk fetches such as api_client.get_course_details_many()
+BACKEND_API_BULK_WORKERS = 8
+
+# Pages api_client.iter_courses() fetches ahead of the one being consumed
+BACKEND_API_READ_AHEAD = 2
+
+# Per-user backend API tokens (see services.token_store); lifetimes apply when
+# a token has no exp claim
+BACKEND_API_TOKENS = {
+    'ACCESS_LIFETIME': 3600,  # seconds
+    'REFRESH_LIFETIME': 86400,
+    'REFRESH_MARGIN': 60,  # refresh in the background this long before expiry
+}
+
+# Seconds between each process publishing its backend API metrics to the
+# cache (see services.metrics)
+BACKEND_API_METRICS_PUBLISH_INTERVAL = 10
+
+# Last good backend API responses on disk (see services.snapshot_store):
+# they warm the cache after a restart and are served while the backend fails
+BACKEND_API_SNAPSHOTS = {
+    'ENABLED': True,
+    'PATH': BASE_DIR / 'backend_snapshots.sqlite3',
+    'MAX_AGE': 7 * 86400,  # seconds
+    'ERROR_TTL': 30,  # seconds a copy served on error counts as fresh
+}
+
+# Write-behind queue for progress updates (services.progress_queue)
+BACKEND_API_PROGRESS_QUEUE = {
+    'ENABLED': True,
+    'PATH': BASE_DIR / 'backend_progress_queue.sqlite3',
+    'BATCH_SIZE': 50,  # updates per batch; a full batch is sent without waiting
+    'FLUSH_INTERVAL': 2.0,  # seconds
+    'MAX_ATTEMPTS': 10,
+    'BACKOFF_BASE': 1.0,  # seconds
+    'BACKOFF_CAP': 300.0,
+}
+
+# Change webhooks from the backend API (see services.invalidation). Requests
+# must be signed with SECRET; none are accepted while it is empty.
+BACKEND_WEBHOOK = {
+    'SECRET': os.environ.get('BACKEND_WEBHOOK_SECRET', ''),
+    'TOLERANCE': 300,  # seconds a signed request stays valid
+}